@@ -0,0 +1,54 @@
+"""Compare the vectorized groupby_count with the former Counter based implementation on synthetic edge lists.
+
+Run from the repository root: python -m benchmarks.bench_groupby_count
+"""
+import time
+import numpy as np
+import pandas as pd
+from collections import Counter
+from twittertennis.handler_utils import groupby_count
+
+# number of edges, nodes and days in the real data sets
+DATA_SIZES = {
+    "rg17": (336234, 78095, 19),
+    "uo17": (475085, 106106, 20),
+}
+
+def counter_groupby_count(df, group_cols, count_col):
+    parts = [df[col] for col in group_cols]
+    tuples = list(zip(*parts))
+    cnt = Counter(tuples)
+    keys, counts = zip(*list(cnt.items()))
+    res = pd.DataFrame(keys, columns=group_cols)
+    res[count_col] = counts
+    return res
+
+def synthetic_edges(num_edges, num_nodes, num_days, seed=0):
+    rng = np.random.RandomState(seed)
+    # heavy-tailed node activity like in mention graphs
+    p = 1.0 / np.arange(1, num_nodes+1)
+    p /= p.sum()
+    dates = np.array(["day_%.2i" % i for i in range(num_days)], dtype=object)
+    return pd.DataFrame({
+        "src": rng.choice(num_nodes, num_edges, p=p) + 10**8,
+        "trg": rng.choice(num_nodes, num_edges, p=p) + 10**8,
+        "date": dates[np.sort(rng.randint(0, num_days, num_edges))],
+    })
+
+def measure(func, *args):
+    start = time.time()
+    res = func(*args)
+    return time.time() - start, res
+
+def main():
+    for data_id, (num_edges, num_nodes, num_days) in DATA_SIZES.items():
+        for scale in [1, 10]:
+            df = synthetic_edges(num_edges*scale, num_nodes*scale, num_days)
+            for group_cols in [["src","trg","date"], ["date","trg"]]:
+                old_time, old_res = measure(counter_groupby_count, df, group_cols, "count")
+                new_time, new_res = measure(groupby_count, df, group_cols, "count")
+                assert new_res.equals(old_res)
+                print("%s x%i %s: Counter %.3fs, numpy %.3fs, speedup %.1fx" % (data_id, scale, group_cols, old_time, new_time, old_time / new_time))
+
+if __name__ == "__main__":
+    main()
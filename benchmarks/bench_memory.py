@@ -0,0 +1,49 @@
+"""Compare the memory usage of the mention table with its compact representation on RG17/UO17-sized synthetic data.
+
+Run from the repository root: python -m benchmarks.bench_memory
+"""
+import io
+import numpy as np
+import pandas as pd
+import pytz
+from twittertennis.compact import CompactMentions
+from twittertennis.tennis_utils import epochs2dates
+
+# number of edges, nodes and days in the real data sets
+DATA_SIZES = {
+    "rg17": (336234, 78095, 19, 1495576800, pytz.timezone('Europe/Paris')),
+    "uo17": (475085, 106106, 20, 1503374400, pytz.timezone('America/New_York')),
+}
+
+def synthetic_mentions(num_edges, num_nodes, num_days, start_time, tz_info, seed=0):
+    rng = np.random.RandomState(seed)
+    p = 1.0 / np.arange(1, num_nodes+1)
+    p /= p.sum()
+    node_ids = rng.randint(10**6, 10**18, num_nodes, dtype="int64")
+    screen_names = np.array(["account_%i" % i for i in range(num_nodes)], dtype=object)
+    src, trg = rng.choice(num_nodes, num_edges, p=p), rng.choice(num_nodes, num_edges, p=p)
+    df = pd.DataFrame({
+        "epoch": np.sort(rng.randint(start_time, start_time + num_days*86400, num_edges)),
+        "src": node_ids[src],
+        "trg": node_ids[trg],
+        "src_screen_str": screen_names[src],
+        "trg_screen_str": screen_names[trg],
+    })
+    # parse it back like the original files
+    buffer = io.StringIO()
+    df.to_csv(buffer, sep="|", index=False)
+    buffer.seek(0)
+    mentions = pd.read_csv(buffer, sep="|")
+    return mentions.assign(date=epochs2dates(mentions["epoch"].values, tz_info))
+
+def main():
+    for data_id, (num_edges, num_nodes, num_days, start_time, tz_info) in DATA_SIZES.items():
+        mentions = synthetic_mentions(num_edges, num_nodes, num_days, start_time, tz_info)
+        original = mentions.memory_usage(deep=True).sum()
+        compact_mentions = CompactMentions(mentions)
+        compact = compact_mentions.memory_usage()
+        decoded = compact_mentions.to_frame().memory_usage(deep=True).sum()
+        print("%s: original %.1f MB, compact %.1f MB (%.1fx smaller), decoded view %.1f MB" % (data_id, original / 2**20, compact / 2**20, original / compact, decoded / 2**20))
+
+if __name__ == "__main__":
+    main()
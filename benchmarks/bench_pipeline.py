@@ -0,0 +1,136 @@
+"""Measure the wall time and peak memory of the handler pipeline stages on synthetic tournaments (see benchmarks/synthetic.py). No network access is needed.
+
+Run from the repository root:
+    python -m benchmarks.bench_pipeline --scale 1 10 --output results.json
+    python -m benchmarks.bench_pipeline --scale 1 10 --baseline results.json
+    python -m benchmarks.bench_pipeline --scale 10 --stages init --compression zip
+
+With '--baseline' the run fails if a stage got slower than the baseline by more than '--tolerance' or its peak memory grew by more than '--memory-tolerance'.
+"""
+import os, sys, json, time, shutil, argparse, tempfile, tracemalloc
+from twittertennis.handler import TennisDataHandler
+from benchmarks.synthetic import generate_tournament, compress_tournament, COMPRESSIONS
+
+STAGES = ["init", "daily_relevance_labels", "export_relevance_labels", "export_edges", "to_json"]
+# peak memory changes below this are measurement noise
+MEMORY_SLACK_MB = 1.0
+
+def read_proc_status(key):
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(key):
+                return int(line.split()[1]) * 1024
+    return None
+
+def reset_peak_rss():
+    """Reset the peak resident set size of the process. Return False if it is not supported (only on Linux)."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return read_proc_status("VmHWM") != None
+    except OSError:
+        return False
+
+def measure(func, trace_memory=True):
+    """Return the result, the wall time (seconds) and the peak memory increase (MB) of a function call. On Linux the peak resident set size is used, elsewhere 'tracemalloc' (which slows down the call)."""
+    use_rss = trace_memory and reset_peak_rss()
+    if use_rss:
+        base = read_proc_status("VmRSS")
+    elif trace_memory:
+        tracemalloc.start()
+    start = time.time()
+    res = func()
+    elapsed = time.time() - start
+    peak = 0.0
+    if use_rss:
+        peak = (read_proc_status("VmHWM") - base) / 2**20
+    elif trace_memory:
+        peak = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+    return res, elapsed, peak
+
+def run_pipeline(data_dir, data_id, output_dir, stages=STAGES, trace_memory=True, backend="networkx", max_snapshot_idx=None):
+    """Run the pipeline stages on a generated data set. Return the wall time and peak memory per stage."""
+    results = {}
+    def record(name, func):
+        res, elapsed, peak = measure(func, trace_memory)
+        results[name] = {"time": elapsed, "peak_mb": peak}
+        print("  %-24s %8.2f s %10.1f MB" % (name, elapsed, peak))
+        return res
+    handler = record("init", lambda: TennisDataHandler(data_dir, data_id, include_qualifiers=True))
+    if "daily_relevance_labels" in stages:
+        record("daily_relevance_labels", lambda: handler.get_daily_relevance_labels())
+    if "export_relevance_labels" in stages:
+        record("export_relevance_labels", lambda: handler.export_relevance_labels(os.path.join(output_dir, "labels")))
+    if "export_edges" in stages:
+        record("export_edges", lambda: handler.export_edges(os.path.join(output_dir, "edges")))
+    if "to_json" in stages:
+        record("to_json", lambda: handler.to_json(os.path.join(output_dir, "%s.json" % data_id), max_snapshot_idx=max_snapshot_idx, backend=backend))
+    return results
+
+def compare(results, baseline, tolerance, memory_tolerance=None):
+    """Return the stages that are slower than in the baseline by more than 'tolerance' or use more peak memory by more than 'memory_tolerance' (relative). Memory is compared only if it was measured in both runs."""
+    regressions = []
+    for run_id, stages in results.items():
+        for stage, res in stages.items():
+            base = baseline.get(run_id, {}).get(stage)
+            if base == None:
+                continue
+            if res["time"] > base["time"] * (1.0 + tolerance):
+                regressions.append((run_id, stage, "time", base["time"], res["time"]))
+            if memory_tolerance != None and base.get("peak_mb", 0.0) > 0.0 and res["peak_mb"] > 0.0:
+                if res["peak_mb"] > base["peak_mb"] * (1.0 + memory_tolerance) + MEMORY_SLACK_MB:
+                    regressions.append((run_id, stage, "peak_mb", base["peak_mb"], res["peak_mb"]))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the handler pipeline on synthetic tournaments")
+    parser.add_argument("--data-id", nargs="+", default=["rg17", "uo17"])
+    parser.add_argument("--scale", nargs="+", type=float, default=[1.0])
+    parser.add_argument("--stages", nargs="+", default=STAGES, choices=STAGES)
+    parser.add_argument("--backend", default="networkx", choices=["networkx", "sparse"])
+    parser.add_argument("--max-snapshot-idx", type=int, default=None, help="limit the number of snapshots in 'to_json'")
+    parser.add_argument("--compression", default=None, choices=COMPRESSIONS, help="read the data from a zip archive or compressed files")
+    parser.add_argument("--no-memory", action="store_true", help="do not measure memory usage")
+    parser.add_argument("--work-dir", default=None, help="keep the generated data here instead of a temporary folder")
+    parser.add_argument("--output", default=None, help="save the results into this JSON file")
+    parser.add_argument("--baseline", default=None, help="compare the results with this JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--memory-tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+    work_dir = tempfile.mkdtemp(prefix="twittertennis_bench_") if args.work_dir == None else args.work_dir
+    results = {}
+    try:
+        for scale in args.scale:
+            for data_id in args.data_id:
+                run_id = "%s_x%g" % (data_id, scale)
+                data_root = os.path.join(work_dir, "data_x%g" % scale if args.compression == None else "data_x%g_%s" % (scale, args.compression))
+                if not (os.path.exists(os.path.join(data_root, data_id)) or os.path.exists(os.path.join(data_root, "%s.zip" % data_id))):
+                    print("Generating %s..." % run_id)
+                    generate_tournament(data_root, data_id, scale)
+                    if args.compression != None:
+                        compress_tournament(data_root, data_id, args.compression)
+                print(run_id)
+                output_dir = os.path.join(work_dir, "output", run_id)
+                results[run_id] = run_pipeline(data_root, data_id, output_dir, args.stages, not args.no_memory, args.backend, args.max_snapshot_idx)
+                shutil.rmtree(output_dir, ignore_errors=True)
+    finally:
+        if args.work_dir == None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    if args.output != None:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline != None:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance, None if args.no_memory else args.memory_tolerance)
+        for run_id, stage, metric, base_value, new_value in regressions:
+            if metric == "time":
+                print("REGRESSION %s %s: %.2f s -> %.2f s" % (run_id, stage, base_value, new_value))
+            else:
+                print("REGRESSION %s %s: %.1f MB -> %.1f MB" % (run_id, stage, base_value, new_value))
+        if len(regressions) > 0:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""Synthetic tournament generator. It writes mention, schedule and player account files in the RG17/UO17 formats, so the pipeline can be benchmarked without downloading the real data.
+
+Run from the repository root: python -m benchmarks.synthetic <output_dir> --data-id rg17 --scale 10
+"""
+import os, json, shutil, argparse, zipfile, gzip, bz2, lzma
+import numpy as np
+import pandas as pd
+from twittertennis.handler import QUALIFIER_START, DATES_WITH_QUALIFIERS, DATES_WITH_NO_GAMES, SCHEDULE_SEP
+
+# number of edges and nodes in the real data sets (with qualifiers)
+DATA_SIZES = {
+    "rg17": (336234, 78095),
+    "uo17": (475085, 106106),
+}
+
+NUM_PLAYERS = 512
+MATCH_HEADERS = ["Men's Singles", "Women's Singles"]
+COURTS = ["Court %i" % i for i in range(1, 9)]
+
+COMPRESSIONS = ["zip", "gz", "bz2", "xz", "zst"]
+
+def node_activity(num_nodes, exponent=0.9):
+    """Heavy-tailed activity distribution of the accounts like in mention graphs"""
+    p = 1.0 / np.arange(1, num_nodes+1) ** exponent
+    return p / p.sum()
+
+def unique_node_ids(num_nodes, rng):
+    node_ids = np.unique(rng.randint(10**6, 10**18, int(num_nodes * 1.01) + 10, dtype="int64"))
+    while len(node_ids) < num_nodes:
+        node_ids = np.unique(np.concatenate([node_ids, rng.randint(10**6, 10**18, num_nodes, dtype="int64")]))
+    return rng.permutation(node_ids)[:num_nodes]
+
+def day_activity(data_id, dates):
+    """Relative number of mentions per day: activity grows towards the final days of the tournament"""
+    weights = np.linspace(1.0, 3.0, len(dates))
+    for i, date in enumerate(dates):
+        if date in DATES_WITH_NO_GAMES[data_id]:
+            weights[i] *= 0.5
+    return weights / weights.sum()
+
+# relative number of mentions per hour (local time): low at night, peak in the afternoon
+HOUR_ACTIVITY = np.array([2, 1, 1, 1, 1, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 10, 10, 9, 9, 8, 7, 5, 4, 3], dtype="float64")
+
+def generate_mentions(file_path, data_id, num_edges, num_nodes, margin_days=1, seed=0):
+    """Write 'num_edges' mentions between 'num_nodes' accounts ordered by epoch. Mentions are generated day by day, and 'margin_days' days are added before and after the tournament so that the time filter has work to do. Return the screen names ordered by activity."""
+    rng = np.random.RandomState(seed)
+    p = node_activity(num_nodes)
+    node_ids = unique_node_ids(num_nodes, rng)
+    screen_names = np.array(["account_%i" % i for i in range(num_nodes)], dtype=object)
+    dates = DATES_WITH_QUALIFIERS[data_id]
+    num_days = len(dates) + 2 * margin_days
+    start_time = QUALIFIER_START[data_id] - margin_days * 86400
+    day_p = np.concatenate([[0.01] * margin_days, day_activity(data_id, dates), [0.01] * margin_days])
+    day_counts = rng.multinomial(num_edges, day_p / day_p.sum())
+    hour_p = HOUR_ACTIVITY / HOUR_ACTIVITY.sum()
+    with open(file_path, "w") as f:
+        for day_idx in range(num_days):
+            n = day_counts[day_idx]
+            day_start = start_time + day_idx * 86400
+            epochs = np.sort(day_start + rng.choice(24, n, p=hour_p) * 3600 + rng.randint(0, 3600, n))
+            src, trg = rng.choice(num_nodes, n, p=p), rng.choice(num_nodes, n, p=p)
+            df = pd.DataFrame({
+                "epoch": epochs,
+                "src": node_ids[src],
+                "trg": node_ids[trg],
+                "src_screen_str": screen_names[src],
+                "trg_screen_str": screen_names[trg],
+            })
+            df.to_csv(f, sep="|", index=False, header=(day_idx == 0))
+    return screen_names
+
+def generate_schedule(file_path, data_id, seed=0):
+    """Write the match schedule. The number of matches decreases day by day as the tournament progresses. Return the player names."""
+    rng = np.random.RandomState(seed)
+    players = np.array(["Player %i" % i for i in range(NUM_PLAYERS)], dtype=object)
+    game_dates = [date for date in DATES_WITH_QUALIFIERS[data_id] if not date in DATES_WITH_NO_GAMES[data_id]]
+    rows = []
+    for i, date in enumerate(game_dates):
+        num_matches = max(1, int(96 * 0.8 ** i))
+        participants = rng.choice(NUM_PLAYERS, 2 * num_matches, replace=False)
+        for m in range(num_matches):
+            rows.append({
+                "date": date,
+                "matchHeader": MATCH_HEADERS[m % 2],
+                "courtName": COURTS[m % len(COURTS)],
+                "orderNumber": m // len(COURTS) + 1,
+                "playerName active": players[participants[2*m]],
+                "playerName opponent": players[participants[2*m+1]],
+            })
+    pd.DataFrame(rows).to_csv(file_path, sep=SCHEDULE_SEP[data_id], index=False)
+    return players
+
+def generate_player_accounts(file_path, players, screen_names, found_ratio=0.8, seed=0):
+    """Assign active Twitter accounts to 'found_ratio' of the players. Some players have two accounts."""
+    rng = np.random.RandomState(seed)
+    num_found = int(len(players) * found_ratio)
+    found_players = rng.choice(len(players), num_found, replace=False)
+    # players are among the most active accounts
+    account_ranks = rng.choice(min(len(screen_names), 20 * len(players)), 2 * num_found, replace=False)
+    player_accounts = {}
+    for i, player_idx in enumerate(found_players):
+        num_accounts = 2 if i % 10 == 0 else 1
+        player_accounts[players[player_idx]] = [screen_names[r] for r in account_ranks[2*i:2*i+num_accounts]]
+    with open(file_path, "w") as f:
+        json.dump(player_accounts, f)
+
+def generate_tournament(output_dir, data_id, scale=1.0, seed=0):
+    """Generate a synthetic tournament in '<output_dir>/<data_id>'. With 'scale=1' the number of mentions and accounts matches the real data set."""
+    base_edges, base_nodes = DATA_SIZES[data_id]
+    data_dir = os.path.join(output_dir, data_id)
+    if not os.path.exists(data_dir):
+        os.makedirs(data_dir)
+    screen_names = generate_mentions(os.path.join(data_dir, "%s_mentions_with_names.csv" % data_id), data_id, int(base_edges * scale), int(base_nodes * scale), seed=seed)
+    players = generate_schedule(os.path.join(data_dir, "%s_schedule.csv" % data_id), data_id, seed=seed)
+    generate_player_accounts(os.path.join(data_dir, "%s_player_accounts.json" % data_id), players, screen_names, seed=seed)
+    return data_dir
+
+def compress_tournament(output_dir, data_id, compression):
+    """Replace the files of a generated tournament with the '<output_dir>/<data_id>.zip' archive ('zip') or with compressed files ('gz', 'bz2', 'xz' or 'zst')."""
+    data_dir = os.path.join(output_dir, data_id)
+    file_names = sorted(os.listdir(data_dir))
+    if compression == "zip":
+        with zipfile.ZipFile(os.path.join(output_dir, "%s.zip" % data_id), "w", zipfile.ZIP_DEFLATED) as zf:
+            for file_name in file_names:
+                zf.write(os.path.join(data_dir, file_name), "%s/%s" % (data_id, file_name))
+        shutil.rmtree(data_dir)
+        return
+    for file_name in file_names:
+        file_path = os.path.join(data_dir, file_name)
+        if compression == "zst":
+            import pyarrow
+            f_out = pyarrow.output_stream(file_path + ".zst", compression="zstd")
+        else:
+            f_out = {"gz":gzip, "bz2":bz2, "xz":lzma}[compression].open("%s.%s" % (file_path, compression), "wb")
+        with open(file_path, "rb") as f_in, f_out:
+            shutil.copyfileobj(f_in, f_out, 2**20)
+        os.remove(file_path)
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic tournament data in the RG17/UO17 formats")
+    parser.add_argument("output_dir")
+    parser.add_argument("--data-id", nargs="+", default=["rg17", "uo17"], choices=list(DATA_SIZES.keys()))
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--compression", default=None, choices=COMPRESSIONS, help="store the files compressed")
+    args = parser.parse_args()
+    for data_id in args.data_id:
+        print(generate_tournament(args.output_dir, data_id, args.scale, args.seed))
+        if args.compression != None:
+            compress_tournament(args.output_dir, data_id, args.compression)
+
+if __name__ == "__main__":
+    main()
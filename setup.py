@@ -15,9 +15,17 @@ setup_requires = ['pytest-runner']
 tests_require = [
     'pytest',
     'pytest-cov',
-    'codecov'
+    'codecov',
+    'scipy',
+    'pyarrow>=4.0; python_version >= "3.7"'
 ]
 
+extras_require = {
+    'sparse': ['scipy'],
+    'parquet': ['pyarrow>=4.0'],
+    'test': tests_require,
+}
+
 keywords = [
     "graph",
     "dynamic graph",
@@ -42,6 +50,7 @@ setup(name='twittertennis',
       install_requires=install_requires,
       setup_requires = setup_requires,
       tests_require = tests_require,
+      extras_require = extras_require,
       keywords = keywords,
       long_description=long_description,
       long_description_content_type='text/markdown',
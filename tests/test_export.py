@@ -1,4 +1,4 @@
-import os, sys, json, shutil
+import os, sys, json, shutil, pytest
 import pandas as pd
 
 delim = os.path.sep
@@ -7,6 +7,8 @@ fdir = delim.join(fp.split(delim)[:-1])
 data_dir = os.path.join(fdir, "..", "data")
 
 from twittertennis.handler import TennisDataHandler
+from twittertennis.export_utils import load_ndjson, load_snapshot_arrays, get_snapshot_arrays, load_partitioned_table
+from twittertennis.batch import run_batch
 
 def load_json(json_fp):
     with open(json_fp) as f:
@@ -40,6 +42,30 @@ def test_label_export():
     assert len(df1) == 78094
     assert len(df2) == 18
     
+def test_label_export_single_file():
+    output_dir = os.path.join(fdir, "rg17_single_label_file")
+    handler = TennisDataHandler(data_dir, "rg17", include_qualifiers=True)
+    for only_pos_label in [False, True]:
+        daily_dir = os.path.join(output_dir, "daily")
+        handler.export_relevance_labels(daily_dir, binary=True, only_pos_label=only_pos_label)
+        handler.export_relevance_labels(output_dir, binary=True, only_pos_label=only_pos_label, single_file=True)
+        labels = pd.read_csv(os.path.join(output_dir, "labels.csv"))
+        assert list(labels.columns) == ["day_index", "node_id", "label"]
+        for i in range(len(handler.dates)):
+            day_labels = labels[labels["day_index"] == i]
+            daily_file = os.path.join(daily_dir, "labels_%i.csv" % i)
+            if os.path.getsize(daily_file) == 0:
+                assert len(day_labels) == 0
+                continue
+            daily_labels = pd.read_csv(daily_file, sep=" ", header=None, names=["node_id", "label"])
+            assert day_labels["node_id"].tolist() == daily_labels["node_id"].tolist()
+            assert day_labels["label"].tolist() == daily_labels["label"].tolist()
+        if only_pos_label:
+            assert (labels["label"] > 0).all()
+        else:
+            assert len(labels) == len(handler.dates) * len(set(handler.account_to_id.values()))
+        shutil.rmtree(output_dir)
+    
 def test_json_export():
     handler = TennisDataHandler(data_dir, "rg17", include_qualifiers=True)
     json_fp = "rg17_temporal.json"
@@ -53,3 +79,121 @@ def test_json_export_max_id():
     handler.to_json(json_fp, task="classification", edge_type="temporal", max_snapshot_idx=3)
     data = load_json(json_fp)
     assert len(data) == 5
+    
+def test_json_export_stream():
+    handler = TennisDataHandler(data_dir, "rg17", include_qualifiers=True)
+    json_fp = "rg17_temporal.json"
+    ndjson_fp = "rg17_temporal.ndjson"
+    handler.to_json(json_fp, task="regression", edge_type="temporal", max_snapshot_idx=3, top_k_nodes=100)
+    handler.to_json(ndjson_fp, task="regression", edge_type="temporal", max_snapshot_idx=3, top_k_nodes=100, lines=True)
+    data = handler.get_regression_data(edge_type="temporal", max_snapshot_idx=3, top_k_nodes=100)
+    with open(json_fp) as f:
+        assert f.read() == json.dumps(data)
+    assert load_ndjson(ndjson_fp) == load_json(json_fp)
+    
+def test_array_export():
+    handler = TennisDataHandler(data_dir, "rg17", include_qualifiers=True)
+    output_dir = os.path.join(fdir, "rg17_arrays")
+    handler.export_arrays(output_dir, task="classification", edge_type="weighted", top_k_nodes=100)
+    data = handler.get_data(edge_type="weighted", top_k_nodes=100)
+    arrays, meta = load_snapshot_arrays(output_dir)
+    assert meta["time_periods"] == data["time_periods"] == 19
+    assert meta["node_ids"] == data["node_ids"]
+    assert arrays["X"].shape == (19, 100, 2)
+    for idx in [0, 18]:
+        snapshot = get_snapshot_arrays(arrays, idx)
+        assert snapshot["edges"].tolist() == [list(edge) for edge in data[str(idx)]["edges"]]
+        assert snapshot["weights"].tolist() == data[str(idx)]["weights"]
+        assert snapshot["y"].tolist() == data[str(idx)]["y"]
+    
+def test_parallel_snapshots():
+    handler = TennisDataHandler(data_dir, "rg17", include_qualifiers=True)
+    data = handler.get_regression_data(delta_t=6*3600, max_snapshot_idx=8)
+    parallel_data = handler.get_regression_data(delta_t=6*3600, max_snapshot_idx=8, n_jobs=2)
+    assert parallel_data == data
+    
+def test_sparse_backend():
+    handler = TennisDataHandler(data_dir, "rg17", include_qualifiers=True)
+    data = handler.get_data(edge_type="temporal", top_k_nodes=5000)
+    sparse_data = handler.get_data(edge_type="temporal", top_k_nodes=5000, backend="sparse")
+    assert sparse_data == data
+    
+def test_snapshot_stream():
+    handler = TennisDataHandler(data_dir, "rg17", include_qualifiers=True)
+    data = handler.get_regression_data(delta_t=6*3600, top_k_nodes=1000)
+    stream = handler.snapshot_stream(delta_t=6*3600, top_k_nodes=1000)
+    mentions = handler.mentions
+    snapshots = list(stream.process(zip(mentions["epoch"], mentions["src"], mentions["trg"])))
+    assert len(snapshots) == data["time_periods"]
+    for snapshot in snapshots:
+        assert snapshot == data[str(snapshot["index"])]
+    
+def test_multi_resolution():
+    handler = TennisDataHandler(data_dir, "rg17", include_qualifiers=False)
+    delta_ts = [3600, 6*3600, 24*3600]
+    data = handler.get_multi_regression_data(delta_ts=delta_ts, windows=[(6*3600, 3600)], top_k_nodes=100)
+    assert len(data) == 4
+    for delta_t in delta_ts:
+        assert data[delta_t] == handler.get_regression_data(delta_t=delta_t, top_k_nodes=100)
+    assert data[(6*3600, 3600)]["time_periods"] == data[3600]["time_periods"]
+    assert sum(data[(6*3600, 3600)]["5"]["y"]) >= sum(data[3600]["5"]["y"])
+    
+def test_snapshot_dataset():
+    handler = TennisDataHandler(data_dir, "rg17", include_qualifiers=True)
+    dataset = handler.get_snapshot_dataset(task="classification", edge_type="temporal", cache_size=2)
+    assert len(dataset) == 19
+    data = handler.get_data(edge_type="temporal", max_snapshot_idx=3)
+    for idx in range(3):
+        assert dataset[idx] == data[str(idx)]
+    assert len(dataset._cache) == 2
+    assert dataset[-1]["index"] == 18
+    assert len([snapshot for snapshot in dataset]) == 19
+    
+def test_columnar_export():
+    pytest.importorskip("pyarrow", minversion="4.0")
+    output_dir = os.path.join(fdir, "rg17_columnar")
+    handler = TennisDataHandler(data_dir, "rg17", include_qualifiers=True)
+    handler.export_relevance_labels(os.path.join(output_dir, "csv"), binary=True, single_file=True)
+    csv_labels = pd.read_csv(os.path.join(output_dir, "csv", "labels.csv"))
+    for file_format in ["parquet", "arrow"]:
+        handler.export_edges(output_dir, file_format=file_format)
+        handler.export_relevance_labels(output_dir, binary=True, file_format=file_format)
+        assert sorted(os.listdir(os.path.join(output_dir, "edges"))) == sorted(["date=%s" % date for date in set(handler.mentions["date"])])
+        edges = load_partitioned_table(os.path.join(output_dir, "edges"), file_format=file_format)
+        assert edges[["epoch", "src", "trg"]].values.tolist() == handler.mentions[["epoch", "src", "trg"]].values.tolist()
+        assert edges["date"].tolist() == handler.mentions["date"].tolist()
+        assert str(edges["day_index"].dtype) == "int16" and str(edges["snapshot"].dtype) == "int32"
+        snapshots = handler.extract_snapshots(3*3600)
+        assert edges["snapshot"].values[:len(snapshots)].tolist() == snapshots["snapshot_id"].astype(int).tolist()
+        # only the partitions of the selected days are read
+        day_edges = load_partitioned_table(os.path.join(output_dir, "edges"), dates=handler.dates[2:4], file_format=file_format)
+        assert len(day_edges) == handler.mentions["date"].isin(handler.dates[2:4]).sum()
+        assert set(day_edges["day_index"]) == {2, 3}
+        labels = load_partitioned_table(os.path.join(output_dir, "labels"), file_format=file_format)
+        assert str(labels["label"].dtype) == "int8"
+        assert labels[["day_index", "node_id", "label"]].values.tolist() == csv_labels.values.tolist()
+        read_table = pd.read_parquet if file_format == "parquet" else pd.read_feather
+        summary = read_table(os.path.join(output_dir, "summary.%s" % file_format)).iloc[0]
+        assert summary["number_of_edges"] == handler.number_of_edges
+        assert list(summary["dates"]) == handler.dates
+    shutil.rmtree(output_dir)
+
+def test_batch():
+    output_dir = os.path.join(fdir, "batch_check")
+    cache_dir = os.path.join(output_dir, "cache")
+    results = run_batch(data_dir, output_dir, ["rg17", "uo17"], exports=["labels", "edges"], n_jobs=2, cache_dir=cache_dir)
+    assert [(res["data_id"], res["include_qualifiers"]) for res in results] == [("rg17", True), ("rg17", False), ("uo17", True), ("uo17", False)]
+    for res in results:
+        handler = TennisDataHandler(data_dir, res["data_id"], include_qualifiers=res["include_qualifiers"])
+        assert res["summary"] == handler.summary()
+        assert len(os.listdir(os.path.join(res["output_dir"], "labels"))) == len(handler.dates) + 1
+        edges = pd.read_csv(os.path.join(res["output_dir"], "edges", "edges.csv"), sep="|", header=None)
+        assert len(edges) == handler.number_of_edges
+        assert "export_edges" in [record["stage"] for record in res["profile"]]
+    # the mention file of each tournament is parsed once
+    cache_entries = os.listdir(cache_dir)
+    assert len([entry for entry in cache_entries if "_source_" in entry]) == 2
+    # handlers without qualifiers are derived from the ones with qualifiers
+    assert len(cache_entries) == 4
+    assert [record["stage"] for record in results[1]["profile"]][0] == "restrict"
+    shutil.rmtree(output_dir)
@@ -0,0 +1,190 @@
+from twittertennis.handler import TennisDataHandler
+from twittertennis.fetch import LocalSource, HTTPSource, download, fetch_data, fetch_data_async, file_checksum, get_data_files
+import os, io, time, shutil, zipfile, filecmp, gzip, threading
+import multiprocessing as mp
+import http.server, http.client
+
+delim = os.path.sep
+fp = os.path.realpath(__file__)
+fdir = delim.join(fp.split(delim)[:-1])
+data_dir = os.path.join(fdir, "..", "data")
+
+def create_mirror(data_id, mirror_dir):
+    """Create '<data_id>.zip' in the same layout as on the public server"""
+    if not os.path.exists(mirror_dir):
+        os.makedirs(mirror_dir)
+    archive_path = os.path.join(mirror_dir, "%s.zip" % data_id)
+    with zipfile.ZipFile(archive_path, "w", zipfile.ZIP_DEFLATED) as zf:
+        for file_name in get_data_files(data_id):
+            zf.write(os.path.join(data_dir, data_id, file_name), "%s/%s" % (data_id, file_name))
+        zf.writestr("%s/README.txt" % data_id, "not needed")
+    return archive_path
+
+def check_data_files(data_id, fetched_dir):
+    for file_name in get_data_files(data_id):
+        assert filecmp.cmp(os.path.join(data_dir, data_id, file_name), os.path.join(fetched_dir, file_name), shallow=False)
+    # only the data files are extracted
+    assert sorted(os.listdir(fetched_dir)) == sorted(get_data_files(data_id))
+
+def test_fetch_from_mirror():
+    output_dir = os.path.join(fdir, "fetch_check")
+    archive_path = create_mirror("rg17", os.path.join(output_dir, "mirror"))
+    fetch_dir = os.path.join(output_dir, "data")
+    fetched_dir = fetch_data(fetch_dir, "rg17", source=os.path.join(output_dir, "mirror"), checksum=file_checksum(archive_path))
+    check_data_files("rg17", fetched_dir)
+    assert os.path.exists(os.path.join(fetch_dir, "rg17.zip"))
+    # the handler loads the fetched data set
+    handler = TennisDataHandler(fetch_dir, "rg17", include_qualifiers=True)
+    assert handler.summary() == TennisDataHandler(data_dir, "rg17", include_qualifiers=True).summary()
+    assert "fetch_data" not in [record["stage"] for record in handler.profiler.records]
+    shutil.rmtree(output_dir)
+
+def test_resumed_download():
+    output_dir = os.path.join(fdir, "fetch_check")
+    archive_path = create_mirror("rg17", os.path.join(output_dir, "mirror"))
+    target_path = os.path.join(output_dir, "rg17.zip")
+    with open(archive_path, "rb") as f:
+        content = f.read()
+    # an interrupted download
+    with open(target_path + ".part", "wb") as f:
+        f.write(content[:len(content) // 3])
+    download(LocalSource(os.path.join(output_dir, "mirror")), "rg17.zip", target_path, checksum=file_checksum(archive_path))
+    assert filecmp.cmp(archive_path, target_path, shallow=False)
+    assert not os.path.exists(target_path + ".part")
+    shutil.rmtree(output_dir)
+
+def test_checksum_mismatch():
+    output_dir = os.path.join(fdir, "fetch_check")
+    create_mirror("rg17", os.path.join(output_dir, "mirror"))
+    fetch_dir = os.path.join(output_dir, "data")
+    try:
+        fetch_data(fetch_dir, "rg17", source=os.path.join(output_dir, "mirror"), checksum="0" * 64)
+        assert False
+    except RuntimeError:
+        assert not os.path.exists(os.path.join(fetch_dir, "rg17.zip"))
+        assert not os.path.exists(os.path.join(fetch_dir, "rg17.zip.part"))
+        assert not os.path.exists(os.path.join(fetch_dir, "rg17"))
+    finally:
+        shutil.rmtree(output_dir)
+
+def fetch_job(args):
+    fetch_dir, mirror_dir = args
+    return fetch_data(fetch_dir, "uo17", source=mirror_dir)
+
+def test_parallel_fetch():
+    output_dir = os.path.join(fdir, "fetch_check")
+    mirror_dir = os.path.join(output_dir, "mirror")
+    create_mirror("uo17", mirror_dir)
+    fetch_dir = os.path.join(output_dir, "data")
+    with mp.Pool(4) as pool:
+        fetched_dirs = pool.map(fetch_job, [(fetch_dir, mirror_dir)] * 4)
+    assert len(set(fetched_dirs)) == 1
+    check_data_files("uo17", fetched_dirs[0])
+    assert sorted(os.listdir(fetch_dir)) == [".uo17.lock", "uo17", "uo17.zip"]
+    # fetching again does not touch the source
+    assert fetch_data_async(fetch_dir, "uo17", source=os.path.join(output_dir, "missing")).result() == fetched_dirs[0]
+    shutil.rmtree(output_dir)
+
+def test_load_from_archive():
+    output_dir = os.path.join(fdir, "fetch_check")
+    mirror_dir = os.path.join(output_dir, "mirror")
+    create_mirror("rg17", mirror_dir)
+    fetch_dir = os.path.join(output_dir, "data")
+    base_handler = TennisDataHandler(data_dir, "rg17", include_qualifiers=False)
+    # the handler downloads the archive and reads the files directly from it
+    handler = TennisDataHandler(fetch_dir, "rg17", include_qualifiers=False, data_source=mirror_dir)
+    assert sorted(os.listdir(fetch_dir)) == [".rg17.lock", "rg17.zip"]
+    assert handler.summary() == base_handler.summary()
+    assert handler.mentions.reset_index(drop=True).equals(base_handler.mentions.reset_index(drop=True))
+    # compressed files
+    gz_dir = os.path.join(output_dir, "gz_data", "rg17")
+    os.makedirs(gz_dir)
+    for file_name in get_data_files("rg17"):
+        with open(os.path.join(data_dir, "rg17", file_name), "rb") as f_in, gzip.open(os.path.join(gz_dir, file_name + ".gz"), "wb") as f_out:
+            shutil.copyfileobj(f_in, f_out)
+    handler = TennisDataHandler(os.path.join(output_dir, "gz_data"), "rg17", include_qualifiers=False, chunksize=10000)
+    assert handler.summary() == base_handler.summary()
+    shutil.rmtree(output_dir)
+
+class TruncatingSource(LocalSource):
+    """Local source that drops the connection in the middle of the first 'num_failures' downloads"""
+
+    def __init__(self, directory, num_failures=1):
+        super().__init__(directory)
+        self.num_failures = num_failures
+
+    def open(self, file_name, offset=0):
+        f, resumed = super().open(file_name, offset)
+        if self.num_failures == 0:
+            return f, resumed
+        self.num_failures -= 1
+        with f:
+            content = f.read()
+        stream = io.BytesIO(content[:len(content) // 2])
+        stream.headers = {"Content-Length": str(len(content))}
+        return stream, resumed
+
+def test_incomplete_download():
+    output_dir = os.path.join(fdir, "fetch_check")
+    mirror_dir = os.path.join(output_dir, "mirror")
+    archive_path = create_mirror("rg17", mirror_dir)
+    target_path = os.path.join(output_dir, "rg17.zip")
+    # the download is resumed after the dropped connection
+    download(TruncatingSource(mirror_dir), "rg17.zip", target_path, retry_wait=0.0)
+    assert filecmp.cmp(archive_path, target_path, shallow=False)
+    os.remove(target_path)
+    try:
+        download(TruncatingSource(mirror_dir, num_failures=2), "rg17.zip", target_path, retries=1, retry_wait=0.0)
+        assert False
+    except ConnectionError:
+        assert not os.path.exists(target_path)
+    # missing files are not retried
+    start = time.time()
+    try:
+        download(LocalSource(mirror_dir), "missing.zip", target_path, retry_wait=10.0)
+        assert False
+    except FileNotFoundError:
+        assert time.time() - start < 5.0
+    shutil.rmtree(output_dir)
+
+class HalfArchiveHandler(http.server.BaseHTTPRequestHandler):
+    """Send the full 'Content-Length' but only half of the file, then close the connection"""
+
+    def do_GET(self):
+        with open(os.path.join(self.server.mirror_dir, os.path.basename(self.path)), "rb") as f:
+            content = f.read()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content[:len(content) // 2])
+        self.close_connection = True
+
+    def log_message(self, *args):
+        pass
+
+def test_truncated_http_download():
+    output_dir = os.path.join(fdir, "fetch_check")
+    mirror_dir = os.path.join(output_dir, "mirror")
+    create_mirror("rg17", mirror_dir)
+    fetch_dir = os.path.join(output_dir, "data")
+    server = http.server.HTTPServer(("127.0.0.1", 0), HalfArchiveHandler)
+    server.mirror_dir = mirror_dir
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        source = HTTPSource("http://127.0.0.1:%i" % server.server_address[1])
+        try:
+            fetch_data(fetch_dir, "rg17", source=source, retries=1)
+            assert False
+        except (ConnectionError, http.client.HTTPException):
+            assert not os.path.exists(os.path.join(fetch_dir, "rg17.zip"))
+    finally:
+        server.shutdown()
+        server.server_close()
+    # a corrupted archive is downloaded again
+    with open(os.path.join(fetch_dir, "rg17.zip"), "wb") as f:
+        f.write(b"not a zip archive")
+    handler = TennisDataHandler(fetch_dir, "rg17", include_qualifiers=False, data_source=mirror_dir)
+    assert handler.summary() == TennisDataHandler(data_dir, "rg17", include_qualifiers=False).summary()
+    assert "fetch_data" in [record["stage"] for record in handler.profiler.records]
+    shutil.rmtree(output_dir)
@@ -1,5 +1,8 @@
-from twittertennis.handler import TennisDataHandler
-import os
+from twittertennis.handler import TennisDataHandler, DATES_WITHOUT_QUALIFIERS
+from twittertennis.tournaments import register_tournament, unregister_tournament, get_tournaments
+from twittertennis.compact import CompactMentions
+import numpy as np
+import os, shutil
 
 delim = os.path.sep
 fp = os.path.realpath(__file__)
@@ -80,4 +83,181 @@ def test_multi_labels():
     assert len(unique_labels) == 3
     assert 0.0 in unique_labels
     assert 1.0 in unique_labels
-    assert 2.0 in unique_labels
\ No newline at end of file
+    assert 2.0 in unique_labels
+    
+def test_cache():
+    cache_dir = os.path.join(fdir, "cache_check")
+    handler = TennisDataHandler(data_dir, "rg17", include_qualifiers=False, use_cache=True, cache_dir=cache_dir)
+    # parsed source files and preprocessed data
+    assert len(os.listdir(cache_dir)) == 2
+    cached_handler = TennisDataHandler(data_dir, "rg17", include_qualifiers=False, use_cache=True, cache_dir=cache_dir)
+    assert cached_handler.summary() == handler.summary()
+    assert cached_handler.mentions.equals(handler.mentions)
+    assert cached_handler.account_to_id == handler.account_to_id
+    assert len(cached_handler.weighted_edges_grouped) == len(handler.dates)
+    assert cached_handler.daily_p_dict == handler.daily_p_dict
+    # the variant with qualifiers is built from the cached source files
+    handler_with_q = TennisDataHandler(data_dir, "rg17", include_qualifiers=True, use_cache=True, cache_dir=cache_dir)
+    assert len(os.listdir(cache_dir)) == 3
+    assert handler_with_q.mentions.equals(TennisDataHandler(data_dir, "rg17", include_qualifiers=True).mentions)
+    removed = cached_handler.clear_cache()
+    assert len(removed) == 3
+    assert len(os.listdir(cache_dir)) == 0
+    
+def test_edge_index():
+    handler = TennisDataHandler(data_dir, "rg17", include_qualifiers=True, build_index=True)
+    mentions = handler.mentions
+    t0, t1 = handler.start_time + 86400, handler.start_time + 2*86400
+    in_range = mentions[(mentions["epoch"] >= t0) & (mentions["epoch"] < t1)]
+    assert handler.edges_between(t0, t1).equals(in_range)
+    assert set(handler.active_nodes(t0, t1)) == set(in_range["src"]).union(set(in_range["trg"]))
+    assert handler.get_num_nodes("2017-05-25") == len(set(in_range["src"]).union(set(in_range["trg"])))
+    account = list(handler.get_account_recoder(k=1).keys())[0]
+    node_id = handler.account_to_id[account]
+    incident = in_range[(in_range["src"] == node_id) | (in_range["trg"] == node_id)]
+    neighbors = set(incident["src"]).union(set(incident["trg"]))
+    if not ((incident["src"] == node_id) & (incident["trg"] == node_id)).any():
+        neighbors.discard(node_id)
+    assert set(handler.neighbors(account, t0, t1)) == neighbors
+    assert handler.extract_snapshots(3600).equals(TennisDataHandler(data_dir, "rg17", include_qualifiers=True).extract_snapshots(3600))
+    
+def test_compact_mentions():
+    handler = TennisDataHandler(data_dir, "rg17", include_qualifiers=False)
+    compact_handler = TennisDataHandler(data_dir, "rg17", include_qualifiers=False, compact=True)
+    assert compact_handler.summary() == handler.summary()
+    assert compact_handler._compact_mentions.src.dtype.itemsize <= 4
+    assert list(compact_handler.mentions.columns) == list(handler.mentions.columns)
+    assert compact_handler.mentions.dtypes.equals(handler.mentions.dtypes)
+    assert compact_handler.mentions.equals(handler.mentions)
+    assert (compact_handler.mentions["src_screen_str"] + "_x").equals(handler.mentions["src_screen_str"] + "_x")
+    categorical_mentions = compact_handler._compact_mentions.to_frame(categorical=True)
+    assert str(categorical_mentions["date"].dtype) == "category"
+    assert categorical_mentions.astype(object).equals(handler.mentions.astype(object))
+    assert compact_handler.get_account_recoder(k=100) == handler.get_account_recoder(k=100)
+    # the edge index works on the compact codes
+    handler.build_edge_index()
+    compact_handler.build_edge_index()
+    assert compact_handler.edge_index.mentions is compact_handler._compact_mentions
+    t0, t1 = handler.start_time + 86400, handler.start_time + 2*86400
+    assert compact_handler.edges_between(t0, t1).equals(handler.edges_between(t0, t1))
+    assert compact_handler.edge_index.date_range(handler.dates[1], handler.dates[3]) == handler.edge_index.date_range(handler.dates[1], handler.dates[3])
+    account = list(handler.get_account_recoder(k=1).keys())[0]
+    assert set(compact_handler.neighbors(account, t0, t1)) == set(handler.neighbors(account, t0, t1))
+    assert compact_handler.get_account_recoder(k=100) == handler.get_account_recoder(k=100)
+    assert compact_handler.extract_snapshots(3600).equals(handler.extract_snapshots(3600))
+    # missing screen names (e.g. 'null' handles parsed as NaN) stay missing
+    mentions = handler.mentions.copy()
+    mentions.loc[mentions.index[:10], "src_screen_str"] = np.nan
+    decoded_mentions = CompactMentions(mentions).to_frame()
+    assert decoded_mentions["src_screen_str"].isna().sum() == 10
+    assert decoded_mentions.equals(mentions)
+    
+def test_chunked_loading():
+    handler = TennisDataHandler(data_dir, "rg17", include_qualifiers=False)
+    chunked_handler = TennisDataHandler(data_dir, "rg17", include_qualifiers=False, csv_engine="c", chunksize=10000)
+    assert chunked_handler.summary() == handler.summary()
+    assert (chunked_handler.mentions["epoch"].diff().dropna() >= 0).all()
+    assert chunked_handler.mentions.equals(handler.mentions)
+    
+def test_profile_report():
+    records = []
+    handler = TennisDataHandler(data_dir, "rg17", include_qualifiers=False, profile_hooks=[records.append])
+    handler.get_daily_relevance_labels()
+    handler.get_data(max_snapshot_idx=2)
+    stages = [record["stage"] for record in records]
+    assert stages[:5] == ["load_files", "filter_data", "extract_mappings", "prepare_edges", "extract_daily_players"]
+    assert "daily_relevance_labels" in stages
+    report = handler.profile_report()
+    assert list(report["stage"]) == list(dict.fromkeys(stages))
+    features = report[report["stage"] == "snapshot_features"].iloc[0]
+    assert features["rows"] == 2
+    assert (report["time"] >= 0).all()
+    assert report[report["stage"] == "filter_data"]["rows"].iloc[0] == handler.number_of_edges
+    
+def copy_data_set(data_id, new_data_id, output_dir):
+    new_dir = os.path.join(output_dir, new_data_id)
+    if not os.path.exists(new_dir):
+        os.makedirs(new_dir)
+    for suffix in ["mentions_with_names.csv", "schedule.csv", "player_accounts.json"]:
+        shutil.copyfile(os.path.join(data_dir, data_id, "%s_%s" % (data_id, suffix)), os.path.join(new_dir, "%s_%s" % (new_data_id, suffix)))
+    
+def test_tournament_registry():
+    custom_dir = os.path.join(fdir, "custom_tournament")
+    copy_data_set("rg17", "rg17custom", custom_dir)
+    register_tournament("rg17custom", "Europe/Paris", "2017-05-24", "2017-05-28", "2017-06-11", dates_with_no_games=["2017-05-27"], schedule_sep="|")
+    try:
+        assert "rg17custom" in get_tournaments()
+        for include_qualifiers in [True, False]:
+            handler = TennisDataHandler(data_dir, "rg17", include_qualifiers=include_qualifiers)
+            custom_handler = TennisDataHandler(custom_dir, "rg17custom", include_qualifiers=include_qualifiers)
+            assert custom_handler.start_time == handler.start_time
+            assert custom_handler.dates == handler.dates
+            summary = custom_handler.summary()
+            assert summary.pop("data_id") == "rg17custom"
+            assert summary == {key:value for key, value in handler.summary().items() if key != "data_id"}
+            assert custom_handler.daily_p_dict == handler.daily_p_dict
+    finally:
+        unregister_tournament("rg17custom")
+        shutil.rmtree(custom_dir)
+    assert "rg17custom" not in get_tournaments()
+    
+def test_cache_tournament_config():
+    custom_dir = os.path.join(fdir, "custom_tournament")
+    cache_dir = os.path.join(custom_dir, "cache")
+    copy_data_set("rg17", "rg17cached", custom_dir)
+    register_tournament("rg17cached", "Europe/Paris", "2017-05-24", "2017-05-28", "2017-06-11", dates_with_no_games=["2017-05-27"], schedule_sep="|")
+    try:
+        TennisDataHandler(custom_dir, "rg17cached", use_cache=True, cache_dir=cache_dir)
+        # the cached data of the previous configuration is not reused
+        register_tournament("rg17cached", "Europe/Paris", "2017-05-24", "2017-05-28", "2017-06-10", dates_with_no_games=["2017-05-27"], schedule_sep="|")
+        cached_handler = TennisDataHandler(custom_dir, "rg17cached", use_cache=True, cache_dir=cache_dir)
+        handler = TennisDataHandler(custom_dir, "rg17cached")
+        assert cached_handler.dates[-1] == "2017-06-10"
+        assert cached_handler.summary() == handler.summary()
+        assert cached_handler.mentions.equals(handler.mentions)
+    finally:
+        unregister_tournament("rg17cached")
+        shutil.rmtree(custom_dir)
+    
+def test_without_qualifiers():
+    full_handler = TennisDataHandler(data_dir, "uo17", include_qualifiers=True)
+    handler = TennisDataHandler(data_dir, "uo17", include_qualifiers=False)
+    derived_handler = full_handler.without_qualifiers()
+    assert derived_handler.summary() == handler.summary()
+    assert full_handler.summary()["include_qualifiers"]
+    assert derived_handler.mentions.equals(handler.mentions)
+    assert list(derived_handler.account_to_id.items()) == list(handler.account_to_id.items())
+    assert derived_handler.weighted_edges.equals(handler.weighted_edges)
+    assert list(derived_handler.edges_grouped.keys()) == list(handler.edges_grouped.keys())
+    # per-date edge groups are shared with the full handler
+    date = handler.dates[0]
+    assert derived_handler.edges_grouped[date] is full_handler.edges_grouped[date]
+    assert derived_handler.weighted_edges_grouped[date] is full_handler.weighted_edges_grouped[date]
+    assert derived_handler.get_data(max_snapshot_idx=2) == handler.get_data(max_snapshot_idx=2)
+    assert derived_handler.get_regression_data(max_snapshot_idx=2) == handler.get_regression_data(max_snapshot_idx=2)
+    
+def test_restrict():
+    handler = TennisDataHandler(data_dir, "rg17", include_qualifiers=True)
+    restricted_handler = handler.restrict(handler.dates[2:5])
+    # the range starts at the local midnight of the first date
+    start_time = handler.start_time + 2*86400
+    assert restricted_handler.start_time == start_time
+    assert restricted_handler.dates == handler.dates[2:5]
+    assert restricted_handler.include_qualifiers
+    mentions = handler.mentions
+    in_range = mentions[(mentions["epoch"] >= start_time) & (mentions["epoch"] <= start_time + 3*86400)]
+    assert in_range[in_range["epoch"] < start_time + 3*86400]["date"].isin(handler.dates[2:5]).all()
+    assert restricted_handler.mentions.equals(in_range)
+    assert restricted_handler.number_of_edges == len(in_range)
+    assert sum(len(df) for df in restricted_handler.edges_grouped.values()) == len(in_range)
+    assert restricted_handler.weighted_edges["weight"].sum() == len(in_range)
+    # ranges within the main tournament do not include qualifiers
+    main_dates = DATES_WITHOUT_QUALIFIERS["rg17"][2:]
+    assert not handler.restrict(main_dates).include_qualifiers
+    assert handler.restrict(main_dates).summary() == handler.without_qualifiers().restrict(main_dates).summary()
+    for dates in [handler.dates[2:1], [handler.dates[3], handler.dates[5]], ["2017-01-01"]]:
+        try:
+            handler.restrict(dates)
+            assert False
+        except RuntimeError:
+            pass
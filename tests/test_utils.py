@@ -0,0 +1,104 @@
+import datetime
+import numpy as np
+import pandas as pd
+import pytz
+import networkx as nx
+
+from twittertennis.tennis_utils import epoch2date, epochs2dates, get_relevance_label_matrix, get_daily_label_dicts, set_label_value, extract_daily_players
+from twittertennis.handler_utils import group_edges, reindex_edges, reindex_labels, edge_array_to_list, calculate_node_features, calculate_node_features_sparse, groupby_count, aggregate_base_buckets, prepare_window_snapshots
+
+def scalar_epoch2date(epoch, tz_info):
+    dt = datetime.datetime.fromtimestamp(epoch, tz=tz_info)
+    return "%i-%.2i-%.2i" % (dt.year, dt.month, dt.day)
+
+def test_epochs2dates_dst():
+    # two days around the 2017 DST transitions in Paris and New York
+    epochs = np.concatenate([np.arange(1490479200-86400, 1490479200+86400, 599), np.arange(1509847200-86400, 1509847200+86400, 599)])
+    for tz in [pytz.timezone('Europe/Paris'), pytz.timezone('America/New_York'), pytz.utc]:
+        dates = epochs2dates(epochs, tz)
+        assert list(dates) == [scalar_epoch2date(e, tz) for e in epochs.tolist()]
+        assert epoch2date(int(epochs[-1]), tz) == dates[-1]
+
+def test_epochs2dates_empty():
+    assert len(epochs2dates([], pytz.utc)) == 0
+
+def test_group_edges():
+    df = pd.DataFrame({"src":[1,2,3,4,5,6], "trg":[0,0,1,1,2,2], "snapshot_id":[2,0,2,1,0,2]})
+    grouped = group_edges(df, "snapshot_id")
+    assert list(grouped.keys()) == [0,1,2]
+    for key, group in grouped.items():
+        assert group.equals(df[df["snapshot_id"]==key])
+
+def test_reindex():
+    id_to_account = {10:"a", 20:"b", 21:"b", 30:"c"}
+    account_to_index = {"b":0, "a":1}
+    df = pd.DataFrame({"src":[10,20,30,21,40], "trg":[21,10,10,20,10]})
+    src, trg = reindex_edges(df, id_to_account, account_to_index)
+    assert list(zip(src, trg)) == [(1,0), (0,1), (0,0)]
+    assert list(src.index) == [0,1,3]
+    labels = reindex_labels({30:5, 20:2, 10:1}, id_to_account, account_to_index)
+    assert labels == {0:2, 1:1}
+
+def test_daily_label_dicts():
+    label_value_dict = {"current":2.0, "previous":1.0, "next":1.0}
+    dates = ["2017-05-27", "2017-05-28", "2017-05-29"]
+    # account 'b_old' is overwritten by 'b' for the same node id
+    user_dict = {"a":1, "b_old":2, "c":3, "b":2, "d":4}
+    screen_name_to_player = {"a":"Player A", "b_old":"Player B", "c":"Player C"}
+    daily_found_player_dict = {"2017-05-27":[], "2017-05-28":["Player A", "Player B"], "2017-05-29":["Player C"]}
+    mapper_dicts = (screen_name_to_player, user_dict, daily_found_player_dict)
+    node_ids, day_indices, node_indices, labels = get_relevance_label_matrix(label_value_dict, dates, mapper_dicts)
+    assert list(node_ids) == [1,2,3,4]
+    assert list(zip(day_indices, node_indices, labels)) == [(0,0,1.0), (1,0,2.0), (1,2,1.0), (2,0,1.0), (2,2,2.0)]
+    res = get_daily_label_dicts(label_value_dict, dates, None, mapper_dicts)
+    for date_idx, date in enumerate(dates):
+        expected = {}
+        for user, user_id in user_dict.items():
+            expected[user_id] = set_label_value(label_value_dict, user, date_idx, dates, screen_name_to_player, daily_found_player_dict)
+        assert dict(res[date]) == expected
+        assert list(res[date].keys()) == list(expected.keys())
+
+def test_sparse_node_features():
+    rng = np.random.RandomState(0)
+    # duplicated edges, reversed edges and self-loops are included
+    edges = rng.randint(0, 40, size=(300, 2))
+    G = nx.Graph()
+    G.add_edges_from(edge_array_to_list(edges))
+    assert calculate_node_features_sparse(edges, 50) == calculate_node_features(G, 50)
+
+def test_sliding_windows():
+    rng = np.random.RandomState(0)
+    mentions = pd.DataFrame({"epoch":np.sort(rng.randint(0, 1000, 300)), "src":rng.randint(0, 5, 300), "trg":rng.randint(0, 5, 300)})
+    window, stride, base_delta = 60, 20, 20
+    mentions["bucket"] = mentions["epoch"] // base_delta
+    base_edges, base_labels = aggregate_base_buckets(mentions, "bucket")
+    snapshots, (edges_grouped, weighted_edges_grouped), labels = prepare_window_snapshots(mentions, base_edges, base_labels, 0, window, stride, base_delta)
+    assert snapshots == list(range(50))
+    for snapshot_id in snapshots:
+        in_window = mentions[(mentions["epoch"] >= snapshot_id*stride) & (mentions["epoch"] < snapshot_id*stride + window)]
+        assert edges_grouped[snapshot_id].equals(in_window[["src","trg"]])
+        weighted_edges = groupby_count(in_window, ["src","trg"], "weight")
+        assert weighted_edges_grouped[snapshot_id][["src","trg","weight"]].reset_index(drop=True).equals(weighted_edges)
+        assert labels[snapshot_id] == dict(in_window["trg"].value_counts())
+
+def test_extract_daily_players():
+    schedule = pd.DataFrame({
+        "date": ["2017-05-29", "2017-05-28", "2017-05-28", "2017-05-28"],
+        "matchHeader": ["Men's Singles", "Men's Singles", "Women's Singles", "Men's Doubles"],
+        "courtName": ["Court 1", "Court 1", "Court 2", "Court 1"],
+        "orderNumber": [1, 1, 1, 2],
+        "playerName active": ["A", "A", "C", "A"],
+        "playerName opponent": ["B", "B", "D", "E"],
+    })
+    player_accounts = {"A": ["a"], "C": ["c"], "E": ["e1", "e2"]}
+    daily_players, daily_players_df = extract_daily_players(schedule, player_accounts)
+    assert list(daily_players.keys()) == ["2017-05-29", "2017-05-28"]
+    # players keep their first position and get the id of their last match
+    assert list(daily_players["2017-05-28"].items()) == [("A", "Men's Doubles_Court 1_2"), ("B", "Men's Singles_Court 1_1"), ("C", "Women's Singles_Court 2_1"), ("D", "Women's Singles_Court 2_1"), ("E", "Men's Doubles_Court 1_2")]
+    assert daily_players_df["date"].tolist() == ["2017-05-28", "2017-05-29"]
+    assert daily_players_df["num_players"].tolist() == [5, 2]
+    assert daily_players_df["num_found_players"].tolist() == [3, 1]
+    assert daily_players_df["num_missing_players"].tolist() == [2, 1]
+    assert sorted(daily_players_df["found_players"][0]) == ["A", "C", "E"]
+    assert sorted(daily_players_df["missing_players"][0]) == ["B", "D"]
+    assert daily_players_df["frac_missing_players"].tolist() == [0.4, 0.5]
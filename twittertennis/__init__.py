@@ -1,5 +1,8 @@
 from twittertennis.handler import *
 from twittertennis.tennis_utils import *
+from twittertennis.tournaments import *
+from twittertennis.batch import *
+from twittertennis.fetch import *
 
 __version__ = '0.1.2'
 
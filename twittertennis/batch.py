@@ -0,0 +1,70 @@
+import os
+import multiprocessing as mp
+from .handler import TennisDataHandler
+from .tournaments import TOURNAMENT_CONFIGS, register_tournaments, get_tournaments
+
+EXPORTS = ["labels", "edges", "json", "arrays"]
+
+def export_data(handler, export, output_dir, **kwargs):
+    """Run an export of the handler into 'output_dir'. Additional keyword arguments are passed to the export method."""
+    if export == "labels":
+        handler.export_relevance_labels(os.path.join(output_dir, "labels"), **kwargs)
+    elif export == "edges":
+        handler.export_edges(os.path.join(output_dir, "edges"), **kwargs)
+    elif export == "json":
+        handler.to_json(os.path.join(output_dir, "snapshots.json"), **kwargs)
+    elif export == "arrays":
+        handler.export_arrays(os.path.join(output_dir, "arrays"), **kwargs)
+    else:
+        raise RuntimeError("Invalid export '%s'! Choose from %s." % (export, EXPORTS))
+
+def process_tournament(job):
+    """Build the handlers and exports of a tournament for each qualifier setting in the same process. The handler without qualifiers is derived from the one with qualifiers if it was already built, otherwise the qualifier settings share the parsed source files through the cache. Thus the mention file is parsed only once."""
+    # tournaments registered in the parent process are not available with the 'spawn' start method
+    register_tournaments(job["tournament_configs"])
+    data_id = job["data_id"]
+    results = []
+    handler = None
+    for include_qualifiers in job["include_qualifiers"]:
+        if not include_qualifiers and handler != None and handler.include_qualifiers:
+            handler = handler.without_qualifiers()
+        else:
+            handler = TennisDataHandler(job["data_dir"], data_id, include_qualifiers=include_qualifiers, use_cache=job["use_cache"], cache_dir=job["cache_dir"], data_source=job["data_source"])
+        output_dir = os.path.join(job["output_dir"], "%s_q%s" % (data_id, include_qualifiers))
+        for export in job["exports"]:
+            export_data(handler, export, output_dir, **job["export_kwargs"].get(export, {}))
+        results.append({
+            "data_id": data_id,
+            "include_qualifiers": include_qualifiers,
+            "output_dir": output_dir,
+            "summary": handler.summary(),
+            "profile": handler.profiler.records,
+        })
+    return results
+
+def run_batch(data_dir, output_dir, data_ids=None, include_qualifiers=[True, False], exports=["labels", "edges"], export_kwargs=None, n_jobs=None, use_cache=True, cache_dir=None, data_source=None):
+    """Build handlers and exports for many tournaments (default: every registered tournament) and qualifier settings. Outputs are written into '<output_dir>/<data_id>_q<include_qualifiers>'. Tournaments are processed in 'n_jobs' processes (use -1 for all CPUs). 'export_kwargs' maps export names ('labels', 'edges', 'json' or 'arrays') to the keyword arguments of the export methods. Missing data sets are fetched from 'data_source' (see 'fetch_data'); parallel jobs share one download. Return the summary and the profile records of each handler."""
+    data_ids = get_tournaments() if data_ids == None else data_ids
+    for export in exports:
+        if not export in EXPORTS:
+            raise RuntimeError("Invalid export '%s'! Choose from %s." % (export, EXPORTS))
+    jobs = [{
+        "data_id": data_id,
+        "data_dir": data_dir,
+        "output_dir": output_dir,
+        "include_qualifiers": list(include_qualifiers),
+        "exports": list(exports),
+        "export_kwargs": {} if export_kwargs == None else export_kwargs,
+        "use_cache": use_cache,
+        "cache_dir": cache_dir,
+        "data_source": data_source,
+        "tournament_configs": {data_id: TOURNAMENT_CONFIGS[data_id]} if data_id in TOURNAMENT_CONFIGS else {},
+    } for data_id in data_ids]
+    if n_jobs == None or n_jobs == 1 or len(jobs) < 2:
+        job_results = [process_tournament(job) for job in jobs]
+    else:
+        if n_jobs < 0:
+            n_jobs = mp.cpu_count()
+        with mp.Pool(min(n_jobs, len(jobs))) as pool:
+            job_results = pool.map(process_tournament, jobs)
+    return [res for results in job_results for res in results]
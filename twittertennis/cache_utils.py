@@ -0,0 +1,119 @@
+import pandas as pd
+import json, os, shutil, hashlib, tempfile
+
+try:
+    import pyarrow
+    CACHE_FORMAT = "feather"
+except ImportError:
+    CACHE_FORMAT = "pickle"
+
+CACHE_TABLES = ["mentions", "weighted_edges", "account_to_id", "id_to_account"]
+# cache variant of the parsed source files that is shared by the variants with and without qualifiers
+SOURCE_VARIANT = "source"
+
+### CACHE KEYS ###
+
+def file_signature(file_path):
+    """Return the modification time and size of a source file"""
+    stat = os.stat(file_path)
+    return [os.path.basename(file_path), stat.st_mtime_ns, stat.st_size]
+
+def get_cache_key(data_id, include_qualifiers, source_files, params=None):
+    """Cache key based on the dataset parameters (e.g. the tournament configuration in 'params'), the source file signatures and the package version."""
+    import twittertennis
+    key_data = {
+        "data_id": data_id,
+        "include_qualifiers": include_qualifiers,
+        "params": params,
+        "source_files": [file_signature(fp) for fp in source_files],
+        "version": twittertennis.__version__,
+        "format": CACHE_FORMAT,
+    }
+    key_str = json.dumps(key_data, sort_keys=True)
+    return hashlib.sha1(key_str.encode("utf-8")).hexdigest()[:16]
+
+def get_cache_prefix(data_id, include_qualifiers):
+    if include_qualifiers == SOURCE_VARIANT:
+        return "%s_%s_" % (data_id, SOURCE_VARIANT)
+    return "%s_q%s_" % (data_id, include_qualifiers)
+
+def get_cache_path(cache_dir, data_id, include_qualifiers, key):
+    return os.path.join(cache_dir, get_cache_prefix(data_id, include_qualifiers) + key)
+
+### TABLE IO ###
+
+def write_table(df, file_path):
+    # keep the original index as the binary formats require a default one
+    df = df.reset_index()
+    if CACHE_FORMAT == "feather":
+        df.to_feather(file_path)
+    else:
+        df.to_pickle(file_path)
+
+def read_table(file_path):
+    if CACHE_FORMAT == "feather":
+        df = pd.read_feather(file_path)
+    else:
+        df = pd.read_pickle(file_path)
+    df = df.set_index("index")
+    df.index.name = None
+    return df
+
+def dict_to_table(d, key_col, value_col):
+    return pd.DataFrame({key_col:list(d.keys()), value_col:list(d.values())})
+
+def table_to_dict(df, key_col, value_col):
+    return dict(zip(df[key_col].tolist(), df[value_col].tolist()))
+
+### CACHE ###
+
+def save_cache(cache_path, tables, meta):
+    """Write tables and metadata into a new cache entry. The entry is written into a temporary folder first, then moved to its final place."""
+    cache_dir = os.path.dirname(cache_path)
+    # parallel workers may create the folder at the same time
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = tempfile.mkdtemp(dir=cache_dir, prefix=".tmp_")
+    try:
+        for name, df in tables.items():
+            write_table(df, os.path.join(tmp_path, "%s.%s" % (name, CACHE_FORMAT)))
+        with open(os.path.join(tmp_path, "meta.json"), 'w') as f:
+            json.dump(meta, f)
+        if os.path.exists(cache_path):
+            shutil.rmtree(cache_path)
+        os.rename(tmp_path, cache_path)
+    except OSError:
+        # another process may have written the same entry meanwhile
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        if not os.path.exists(cache_path):
+            raise
+
+def load_cache(cache_path, table_names=CACHE_TABLES):
+    """Load tables and metadata from a cache entry. Return 'None' if the entry does not exist."""
+    meta_path = os.path.join(cache_path, "meta.json")
+    if not os.path.exists(meta_path):
+        return None
+    tables = {}
+    for name in table_names:
+        tables[name] = read_table(os.path.join(cache_path, "%s.%s" % (name, CACHE_FORMAT)))
+    with open(meta_path) as f:
+        meta = json.load(f)
+    return tables, meta
+
+def clear_cache(cache_dir, data_id=None, include_qualifiers=None, keep=None):
+    """Remove cache entries. Filter for 'data_id' and 'include_qualifiers' (True, False or 'SOURCE_VARIANT') if they are specified. The entry with the 'keep' key is not removed."""
+    if not os.path.exists(cache_dir):
+        return []
+    removed = []
+    for entry in sorted(os.listdir(cache_dir)):
+        if data_id != None:
+            if include_qualifiers == None:
+                prefixes = [get_cache_prefix(data_id, q) for q in [True, False, SOURCE_VARIANT]]
+            else:
+                prefixes = [get_cache_prefix(data_id, include_qualifiers)]
+            if not any(entry.startswith(prefix) for prefix in prefixes):
+                continue
+        if keep != None and entry.endswith("_" + keep):
+            continue
+        shutil.rmtree(os.path.join(cache_dir, entry), ignore_errors=True)
+        removed.append(entry)
+    return removed
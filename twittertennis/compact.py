@@ -0,0 +1,71 @@
+import pandas as pd
+import numpy as np
+
+def smallest_int_dtype(max_value):
+    """Return the smallest signed integer type that can store values from 0 to 'max_value'"""
+    for dtype in ["int8", "int16", "int32"]:
+        if max_value <= np.iinfo(dtype).max:
+            return dtype
+    return "int64"
+
+class CompactMentions():
+    """Compact in-memory representation of the mention table. Node identifiers are stored as int32 codes of a node vocabulary, source and target screen names as codes of one shared screen name vocabulary, dates as small integer day indices and epochs relative to the first mention. Use 'to_frame' to get the original table."""
+
+    def __init__(self, mentions):
+        epochs = mentions["epoch"].values
+        self.min_epoch = int(epochs.min()) if len(epochs) > 0 else 0
+        self.epochs = (epochs - self.min_epoch).astype(smallest_int_dtype(epochs.max() - self.min_epoch if len(epochs) > 0 else 0))
+        num_rows = len(mentions)
+        # nodes
+        self.node_ids, node_codes = np.unique(np.concatenate([mentions["src"].values, mentions["trg"].values]), return_inverse=True)
+        node_codes = node_codes.reshape(-1).astype(smallest_int_dtype(len(self.node_ids)))
+        self.src, self.trg = node_codes[:num_rows], node_codes[num_rows:]
+        # screen names
+        name_codes, screen_names = pd.factorize(np.concatenate([mentions["src_screen_str"].to_numpy(dtype=object), mentions["trg_screen_str"].to_numpy(dtype=object)]))
+        self.screen_names = pd.Index(screen_names)
+        name_codes = name_codes.astype(smallest_int_dtype(len(self.screen_names)))
+        self.src_screen_str, self.trg_screen_str = name_codes[:num_rows], name_codes[num_rows:]
+        # dates
+        if "date" in mentions.columns:
+            date_codes, dates = pd.factorize(mentions["date"].to_numpy(dtype=object), sort=True)
+            self.dates = pd.Index(dates)
+            self.date = date_codes.astype(smallest_int_dtype(len(self.dates)))
+        else:
+            self.dates, self.date = None, None
+        # string columns are decoded into their original types
+        self.dtypes = {col:mentions[col].dtype for col in ["src_screen_str", "trg_screen_str", "date"] if col in mentions.columns}
+        index = mentions.index.values
+        self.index = index.astype(smallest_int_dtype(index.max())) if len(index) > 0 and index.min() >= 0 else index
+
+    def __len__(self):
+        return len(self.epochs)
+
+    def _decode(self, codes, categories, categorical):
+        if categorical:
+            return pd.Categorical.from_codes(codes, categories=categories)
+        # missing values have the code -1
+        return categories.take(codes, allow_fill=True, fill_value=np.nan)
+
+    def to_frame(self, categorical=False, start=None, end=None):
+        """Decode the original mention table. Use 'categorical=True' to get screen names and dates as categorical columns, which is faster and needs less memory. Use 'start' and 'end' to decode only the rows between these positions."""
+        rows = slice(start, end)
+        columns = {
+            "epoch": self.epochs[rows].astype("int64") + self.min_epoch,
+            "src": self.node_ids[self.src[rows]],
+            "trg": self.node_ids[self.trg[rows]],
+            "src_screen_str": self._decode(self.src_screen_str[rows], self.screen_names, categorical),
+            "trg_screen_str": self._decode(self.trg_screen_str[rows], self.screen_names, categorical),
+        }
+        if self.date is not None:
+            columns["date"] = self._decode(self.date[rows], self.dates, categorical)
+        frame = pd.DataFrame(columns, index=self.index[rows].astype("int64"))
+        return frame if categorical else frame.astype(self.dtypes)
+
+    def memory_usage(self):
+        """Memory usage of the compact representation in bytes"""
+        arrays = [self.epochs, self.node_ids, self.src, self.trg, self.src_screen_str, self.trg_screen_str, self.index]
+        total = sum(arr.nbytes for arr in arrays)
+        total += self.screen_names.memory_usage(deep=True)
+        if self.date is not None:
+            total += self.date.nbytes + self.dates.memory_usage(deep=True)
+        return total
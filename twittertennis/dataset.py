@@ -0,0 +1,45 @@
+from collections import OrderedDict
+
+class SnapshotDataset():
+    """Lazy, indexable sequence of snapshots. Each snapshot is computed on demand by 'snapshot_func' and the last 'cache_size' snapshots are kept in an LRU cache (use 'cache_size=None' for unlimited cache)."""
+    
+    def __init__(self, snapshot_func, num_snapshots, node_ids, cache_size=16):
+        self.snapshot_func = snapshot_func
+        self.num_snapshots = num_snapshots
+        self.node_ids = node_ids
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        
+    def __len__(self):
+        return self.num_snapshots
+    
+    def __getitem__(self, idx):
+        if idx < 0:
+            idx += self.num_snapshots
+        if idx < 0 or idx >= self.num_snapshots:
+            raise IndexError("Snapshot index out of range!")
+        if idx in self._cache:
+            self._cache.move_to_end(idx)
+            return self._cache[idx]
+        snapshot = self.snapshot_func(idx)
+        if self.cache_size == None or self.cache_size > 0:
+            self._cache[idx] = snapshot
+            if self.cache_size != None and len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return snapshot
+    
+    def __iter__(self):
+        for idx in range(self.num_snapshots):
+            yield self[idx]
+            
+    def clear_cache(self):
+        self._cache.clear()
+    
+    def to_dict(self):
+        """Materialize every snapshot in the same format as 'TennisDataHandler.get_data'"""
+        data = {}
+        for snapshot in self:
+            data[str(snapshot["index"])] = snapshot
+        data["time_periods"] = self.num_snapshots
+        data["node_ids"] = self.node_ids
+        return data
@@ -0,0 +1,111 @@
+import numpy as np
+from .compact import CompactMentions
+
+class TemporalEdgeIndex():
+    """Index of an epoch ordered edge stream for time range queries. Edges are kept in epoch order, and the positions of the edges incident to each node are stored in CSR format. Queries use binary search and slicing instead of scanning every edge. Time ranges are half-open: [t0, t1)."""
+
+    def __init__(self, mentions):
+        if isinstance(mentions, CompactMentions):
+            self._init_compact(mentions)
+            return
+        epochs = mentions["epoch"].values
+        if len(epochs) > 1 and np.any(epochs[1:] < epochs[:-1]):
+            raise RuntimeError("Mentions must be ordered by epoch!")
+        self.mentions = mentions
+        self.epochs = epochs
+        self.src = mentions["src"].values
+        self.trg = mentions["trg"].values
+        self.dates = mentions["date"].to_numpy(dtype=object) if "date" in mentions.columns else None
+        self.date_codes = None
+        self._build_adjacency()
+
+    def _init_compact(self, mentions):
+        """Index a 'CompactMentions' table without decoding it: its node and date codes are used directly and only the queried slices are decoded."""
+        epochs = mentions.epochs
+        if len(epochs) > 1 and np.any(epochs[1:] < epochs[:-1]):
+            raise RuntimeError("Mentions must be ordered by epoch!")
+        self.mentions = mentions
+        self.epochs = epochs.astype("int64") + mentions.min_epoch
+        # the node vocabulary is sorted and unique like in '_build_adjacency'
+        self.node_ids, self.src_idx, self.trg_idx = mentions.node_ids, mentions.src, mentions.trg
+        self.src, self.trg = None, None
+        # the date vocabulary is sorted, so the codes are ordered like the dates
+        self.dates, self.date_codes = (None, None) if mentions.date is None else (mentions.dates.to_numpy(dtype=object), mentions.date)
+        self._build_csr()
+
+    def _build_adjacency(self):
+        num_edges = len(self.epochs)
+        self.node_ids, node_idx = np.unique(np.concatenate([self.src, self.trg]), return_inverse=True)
+        node_idx = node_idx.reshape(-1)
+        self.src_idx, self.trg_idx = node_idx[:num_edges], node_idx[num_edges:]
+        self._build_csr()
+
+    def _build_csr(self):
+        num_edges = len(self.epochs)
+        positions = np.arange(num_edges)
+        # self-loops are stored only once for their node
+        not_loop = self.src_idx != self.trg_idx
+        nodes = np.concatenate([self.src_idx, self.trg_idx[not_loop]]).astype("int64")
+        edge_positions = np.concatenate([positions, positions[not_loop]])
+        order = np.lexsort((edge_positions, nodes))
+        self.adj_positions = edge_positions[order]
+        self.adj_indptr = np.concatenate([[0], np.cumsum(np.bincount(nodes, minlength=len(self.node_ids)))])
+
+    def __len__(self):
+        return len(self.epochs)
+
+    def edge_range(self, t0=None, t1=None):
+        """Return the first and last+1 positions of the edges in [t0, t1)"""
+        start = 0 if t0 == None else np.searchsorted(self.epochs, t0, side="left")
+        end = len(self.epochs) if t1 == None else np.searchsorted(self.epochs, t1, side="left")
+        return start, max(start, end)
+
+    def date_range(self, first_date, last_date=None):
+        """Return the first and last+1 positions of the edges from 'first_date' to 'last_date' (inclusive)"""
+        if self.dates is None:
+            raise RuntimeError("The indexed mentions have no 'date' column!")
+        last_date = first_date if last_date == None else last_date
+        if self.date_codes is not None:
+            first_code = np.searchsorted(self.dates, first_date, side="left")
+            last_code = np.searchsorted(self.dates, last_date, side="right")
+            start = np.searchsorted(self.date_codes, first_code, side="left")
+            end = np.searchsorted(self.date_codes, last_code, side="left")
+        else:
+            start = np.searchsorted(self.dates, first_date, side="left")
+            end = np.searchsorted(self.dates, last_date, side="right")
+        return start, max(start, end)
+
+    def edges_between(self, t0=None, t1=None):
+        """Return the edges in [t0, t1) as a slice of the indexed mentions"""
+        start, end = self.edge_range(t0, t1)
+        return self.edges_in_range(start, end)
+
+    def edges_in_range(self, start, end):
+        """Return the edges between the given positions as a slice of the indexed mentions"""
+        if isinstance(self.mentions, CompactMentions):
+            return self.mentions.to_frame(start=start, end=end)
+        return self.mentions.iloc[start:end]
+
+    def active_nodes(self, t0=None, t1=None):
+        """Return the identifiers of the nodes with at least one edge in [t0, t1)"""
+        start, end = self.edge_range(t0, t1)
+        return self.nodes_in_range(start, end)
+
+    def nodes_in_range(self, start, end):
+        """Return the identifiers of the nodes with at least one edge between the given positions"""
+        node_idx = np.unique(np.concatenate([self.src_idx[start:end], self.trg_idx[start:end]]))
+        return self.node_ids[node_idx]
+
+    def neighbors(self, node_id, t0=None, t1=None):
+        """Return the identifiers of the nodes connected to 'node_id' (in any direction) in [t0, t1)"""
+        pos = np.searchsorted(self.node_ids, node_id)
+        if pos >= len(self.node_ids) or self.node_ids[pos] != node_id:
+            return np.array([], dtype=self.node_ids.dtype)
+        edge_positions = self.adj_positions[self.adj_indptr[pos]:self.adj_indptr[pos+1]]
+        # incident edges are ordered by epoch as well
+        edge_epochs = self.epochs[edge_positions]
+        start = 0 if t0 == None else np.searchsorted(edge_epochs, t0, side="left")
+        end = len(edge_positions) if t1 == None else np.searchsorted(edge_epochs, t1, side="left")
+        edge_positions = edge_positions[start:end]
+        other_idx = np.where(self.src_idx[edge_positions] == pos, self.trg_idx[edge_positions], self.src_idx[edge_positions])
+        return self.node_ids[np.unique(other_idx)]
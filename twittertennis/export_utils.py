@@ -0,0 +1,201 @@
+import pandas as pd
+import numpy as np
+import json, os, shutil
+
+try:
+    import pyarrow
+    import pyarrow.dataset, pyarrow.parquet, pyarrow.feather
+except ImportError:
+    pyarrow = None
+
+# columnar export formats (format -> file extension)
+COLUMNAR_FORMATS = {"parquet": "parquet", "arrow": "arrow"}
+
+### JSON ###
+
+def write_json_stream(f, snapshot_iter, node_ids):
+    """Write snapshots into a JSON object one by one. The output is identical to 'json.dump' of the fully materialized dictionary."""
+    f.write("{")
+    num_snapshots = 0
+    for snapshot in snapshot_iter:
+        f.write("%s: %s, " % (json.dumps(str(snapshot["index"])), json.dumps(snapshot)))
+        num_snapshots += 1
+    f.write('"time_periods": %s, ' % json.dumps(num_snapshots))
+    f.write('"node_ids": %s}' % json.dumps(node_ids))
+    return num_snapshots
+
+def write_ndjson(f, snapshot_iter, node_ids):
+    """Write each snapshot into a separate line (NDJSON). The last line contains the number of snapshots and the node identifiers."""
+    num_snapshots = 0
+    for snapshot in snapshot_iter:
+        f.write(json.dumps(snapshot) + "\n")
+        num_snapshots += 1
+    f.write(json.dumps({"time_periods":num_snapshots, "node_ids":node_ids}) + "\n")
+    return num_snapshots
+
+def load_ndjson(path):
+    """Load an NDJSON export into the same dictionary structure as the JSON export"""
+    data = {}
+    with open(path) as f:
+        for line in f:
+            record = json.loads(line)
+            if "index" in record:
+                data[str(record["index"])] = record
+            else:
+                data.update(record)
+    return data
+
+### ARRAYS ###
+
+ARRAY_NAMES = ["edges", "weights", "edge_offsets", "X", "y"]
+
+def write_snapshot_arrays(output_dir, snapshot_iter, num_snapshots, node_ids, meta=None, num_features=2):
+    """Write snapshots into NumPy arrays: edges and weights of every snapshot are concatenated and indexed by 'edge_offsets', while node features and labels are stored in (snapshot x node) arrays."""
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    num_nodes = len(node_ids)
+    X = np.lib.format.open_memmap(os.path.join(output_dir, "X.npy"), mode="w+", dtype="float64", shape=(num_snapshots, num_nodes, num_features))
+    y = np.lib.format.open_memmap(os.path.join(output_dir, "y.npy"), mode="w+", dtype="float64", shape=(num_snapshots, num_nodes))
+    edges, weights = [], []
+    edge_offsets = np.zeros(num_snapshots+1, dtype="int64")
+    for snapshot in snapshot_iter:
+        idx = snapshot["index"]
+        snap_edges = np.array(snapshot["edges"], dtype="int64").reshape(-1, 2)
+        edges.append(snap_edges)
+        weights.append(np.array(snapshot["weights"], dtype="float64"))
+        edge_offsets[idx+1] = edge_offsets[idx] + len(snap_edges)
+        X[idx] = np.array(snapshot["X"], dtype="float64").reshape(num_nodes, num_features)
+        y[idx] = snapshot["y"]
+    X.flush()
+    y.flush()
+    del X, y
+    np.save(os.path.join(output_dir, "edges.npy"), np.concatenate(edges) if len(edges) > 0 else np.zeros((0,2), dtype="int64"))
+    np.save(os.path.join(output_dir, "weights.npy"), np.concatenate(weights) if len(weights) > 0 else np.zeros(0, dtype="float64"))
+    np.save(os.path.join(output_dir, "edge_offsets.npy"), edge_offsets)
+    meta = {} if meta == None else dict(meta)
+    meta["time_periods"] = num_snapshots
+    meta["node_ids"] = node_ids
+    with open(os.path.join(output_dir, "meta.json"), 'w') as f:
+        json.dump(meta, f)
+
+def load_snapshot_arrays(input_dir, mmap_mode="r"):
+    """Load arrays written by 'write_snapshot_arrays'. Arrays are memory-mapped by default."""
+    arrays = {}
+    for name in ARRAY_NAMES:
+        arrays[name] = np.load(os.path.join(input_dir, "%s.npy" % name), mmap_mode=mmap_mode)
+    with open(os.path.join(input_dir, "meta.json")) as f:
+        meta = json.load(f)
+    return arrays, meta
+
+def get_snapshot_arrays(arrays, idx):
+    """Return the edges, weights, node features and labels of a snapshot as views of the loaded arrays"""
+    start, end = arrays["edge_offsets"][idx], arrays["edge_offsets"][idx+1]
+    return {
+        "index": idx,
+        "edges": arrays["edges"][start:end],
+        "weights": arrays["weights"][start:end],
+        "y": arrays["y"][idx],
+        "X": arrays["X"][idx],
+    }
+
+### LABELS ###
+
+def get_label_columns(node_ids, day_indices, node_indices, labels, num_days, only_pos_label=False):
+    """Convert the sparse relevance label matrix (see 'get_relevance_label_matrix') into 'day_index', 'node_id' and 'label' columns ordered by day and node id. Every (day, node) pair is included unless 'only_pos_label=True'."""
+    order = np.argsort(node_ids, kind="stable")
+    ranks = np.empty(len(node_ids), dtype="int64")
+    ranks[order] = np.arange(len(node_ids))
+    if only_pos_label:
+        mask = labels > 0.0
+        day_indices, node_ranks, labels = day_indices[mask], ranks[node_indices[mask]], labels[mask]
+        pos = np.lexsort((node_ranks, day_indices))
+        return {"day_index":day_indices[pos], "node_id":node_ids[order][node_ranks[pos]], "label":labels[pos]}
+    dense_labels = np.zeros((num_days, len(node_ids)), dtype="float64")
+    dense_labels[day_indices, ranks[node_indices]] = labels
+    return {
+        "day_index": np.repeat(np.arange(num_days, dtype="int64"), len(node_ids)),
+        "node_id": np.tile(node_ids[order], num_days),
+        "label": dense_labels.reshape(-1),
+    }
+
+def write_label_table(path, label_columns, sep=","):
+    """Write the labels of every day into a single file with a header"""
+    pd.DataFrame(label_columns, columns=["day_index", "node_id", "label"]).to_csv(path, sep=sep, index=False)
+
+def write_daily_label_files(output_dir, label_columns, dates, sep=" "):
+    """Write the labels of each day into a separate 'labels_<day_index>.csv' file (node id and label without header)"""
+    day_offsets = np.searchsorted(label_columns["day_index"], np.arange(len(dates)+1))
+    for i, date in enumerate(dates):
+        start, end = day_offsets[i], day_offsets[i+1]
+        print(date, end - start)
+        day_df = pd.DataFrame({"node_id":label_columns["node_id"][start:end], "score":label_columns["label"][start:end]})
+        day_df.to_csv(os.path.join(output_dir, "labels_%i.csv" % i), sep=sep, header=False, index=False)
+
+### COLUMNAR ###
+
+def check_file_format(file_format):
+    if file_format != "csv" and not file_format in COLUMNAR_FORMATS:
+        raise RuntimeError("Invalid file format '%s'! Choose from %s." % (file_format, ["csv"] + list(COLUMNAR_FORMATS.keys())))
+    if file_format != "csv" and pyarrow == None:
+        raise RuntimeError("Install 'pyarrow' to export '%s' files!" % file_format)
+
+def get_dataset_format(file_format):
+    return "ipc" if file_format == "arrow" else file_format
+
+def write_partitioned_table(output_dir, columns, file_format="parquet"):
+    """Write the columns into a dataset partitioned by the 'date' column in hive layout ('<output_dir>/date=<date>/part-0.<ext>'). The previous content of 'output_dir' is removed. Readers filtering on 'date' only open the files of the selected days (see 'load_partitioned_table'), and Parquet row group statistics allow skipping on the other columns."""
+    check_file_format(file_format)
+    if os.path.exists(output_dir):
+        shutil.rmtree(output_dir)
+    table = pyarrow.table(columns)
+    partitioning = pyarrow.dataset.partitioning(pyarrow.schema([("date", pyarrow.string())]), flavor="hive")
+    pyarrow.dataset.write_dataset(table, output_dir, format=get_dataset_format(file_format), partitioning=partitioning, basename_template="part-{i}.%s" % COLUMNAR_FORMATS[file_format])
+
+def load_partitioned_table(input_dir, dates=None, columns=None, file_format="parquet"):
+    """Load a dataset written by 'write_partitioned_table' into a data frame ordered by date. Only the partitions of the given 'dates' are read."""
+    check_file_format(file_format)
+    dataset = pyarrow.dataset.dataset(input_dir, format=get_dataset_format(file_format), partitioning="hive")
+    date_filter = None if dates == None else pyarrow.dataset.field("date").isin(list(dates))
+    return dataset.to_table(columns=columns, filter=date_filter).to_pandas()
+
+def write_partitioned_edges(output_dir, mentions, dates, start_time, delta_t, file_format="parquet"):
+    """Write the mentions partitioned by day with 'epoch', 'src', 'trg', 'day_index' and 'snapshot' columns. 'day_index' is the index of the date in 'dates' (-1 for other dates) and 'snapshot' is the index of the 'delta_t' long time period from 'start_time'. Small integer types are used for the indices, so they compress well with dictionary and run-length encoding."""
+    epochs = mentions["epoch"].values.astype("int64")
+    columns = {
+        "epoch": epochs,
+        "src": mentions["src"].values.astype("int64"),
+        "trg": mentions["trg"].values.astype("int64"),
+        "day_index": pd.Categorical(mentions["date"], categories=dates).codes.astype("int16"),
+        "snapshot": ((epochs - start_time) // delta_t).astype("int32"),
+        "date": mentions["date"].to_numpy(dtype=object),
+    }
+    write_partitioned_table(output_dir, columns, file_format)
+
+def write_partitioned_labels(output_dir, label_columns, dates, binary=True, file_format="parquet"):
+    """Write the labels (see 'get_label_columns') partitioned by day with 'day_index', 'node_id' and 'label' columns. Binary labels are stored as 'int8'."""
+    columns = {
+        "day_index": label_columns["day_index"].astype("int16"),
+        "node_id": label_columns["node_id"].astype("int64"),
+        "label": label_columns["label"].astype("int8" if binary else "float64"),
+        "date": np.array(dates, dtype=object)[label_columns["day_index"]],
+    }
+    write_partitioned_table(output_dir, columns, file_format)
+
+def write_summary_table(path, summary, file_format="parquet"):
+    """Write the data summary into a single row table"""
+    check_file_format(file_format)
+    schema = pyarrow.schema([
+        ("data_id", pyarrow.string()),
+        ("include_qualifiers", pyarrow.bool_()),
+        ("dates", pyarrow.list_(pyarrow.string())),
+        ("dates_with_no_game", pyarrow.list_(pyarrow.string())),
+        ("start_time", pyarrow.int64()),
+        ("end_time", pyarrow.int64()),
+        ("number_of_edges", pyarrow.int64()),
+        ("number_of_nodes", pyarrow.int64()),
+    ])
+    table = pyarrow.Table.from_pydict({key:[summary[key]] for key in schema.names}, schema=schema)
+    if file_format == "parquet":
+        pyarrow.parquet.write_table(table, path)
+    else:
+        pyarrow.feather.write_feather(table, path)
@@ -0,0 +1,237 @@
+import os, time, shutil, hashlib, zipfile, tempfile
+import urllib.request, urllib.error, http.client
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from .io_utils import find_member, find_data_file
+
+DATA_URL = "https://dms.sztaki.hu/~fberes/tennis"
+DATA_FILES = ["%s_mentions_with_names.csv", "%s_schedule.csv", "%s_player_accounts.json"]
+# SHA-256 checksums of the archives ('data_id' -> hex digest). Archives without a registered checksum are not verified.
+DATA_CHECKSUMS = {}
+
+### SOURCES ###
+
+class HTTPSource():
+    """Download files from 'base_url'. Interrupted downloads are resumed with HTTP range requests if the server supports them."""
+
+    def __init__(self, base_url=DATA_URL, timeout=60):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def __repr__(self):
+        return self.base_url
+
+    def open(self, file_name, offset=0):
+        """Return a binary stream of the file from 'offset' and whether the stream really starts at 'offset' (otherwise it starts at 0)"""
+        request = urllib.request.Request("%s/%s" % (self.base_url, file_name))
+        if offset > 0:
+            request.add_header("Range", "bytes=%i-" % offset)
+        try:
+            response = urllib.request.urlopen(request, timeout=self.timeout)
+        except urllib.error.HTTPError as e:
+            # the requested range starts at the end of the file
+            if e.code == 416 and offset > 0:
+                return open(os.devnull, "rb"), True
+            raise
+        return response, offset > 0 and response.status == 206
+
+class LocalSource():
+    """Copy files from a local directory (e.g. a mirror on a shared disk)"""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def __repr__(self):
+        return self.directory
+
+    def open(self, file_name, offset=0):
+        """Return a binary stream of the file from 'offset' and whether the stream really starts at 'offset' (otherwise it starts at 0)"""
+        f = open(os.path.join(self.directory, file_name), "rb")
+        f.seek(offset)
+        return f, True
+
+def get_source(source=None):
+    """Return the default HTTP source for 'None', a 'LocalSource' for a directory path and a 'HTTPSource' for a URL. Other objects are returned as they are: they must implement 'open(file_name, offset)'."""
+    if source == None:
+        return HTTPSource()
+    if isinstance(source, str):
+        if source.startswith("http://") or source.startswith("https://"):
+            return HTTPSource(source)
+        return LocalSource(source)
+    return source
+
+### DOWNLOAD ###
+
+def file_checksum(file_path, chunk_size=2**20):
+    """SHA-256 hex digest of a file"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def get_stream_length(stream):
+    """Return the number of bytes left in a source stream: the 'Content-Length' header of HTTP responses or the remaining size of local files. Return 'None' if it is unknown."""
+    headers = getattr(stream, "headers", None)
+    if headers != None:
+        length = headers.get("Content-Length")
+        return None if length == None else int(length)
+    try:
+        return os.fstat(stream.fileno()).st_size - stream.tell()
+    except (AttributeError, OSError, ValueError):
+        return None
+
+def is_transient_error(error):
+    """Errors that may not occur on retry (connection problems, incomplete reads, server errors). Missing files and client errors (e.g. 404) are not retried."""
+    if isinstance(error, urllib.error.HTTPError):
+        return error.code >= 500 or error.code in [408, 429]
+    if isinstance(error, (FileNotFoundError, PermissionError, IsADirectoryError, NotADirectoryError)):
+        return False
+    return isinstance(error, (OSError, http.client.HTTPException))
+
+def is_valid_archive(zip_path, test_members=False):
+    """Check whether the zip archive can be opened. With 'test_members=True' the CRC of every member is checked as well."""
+    try:
+        with zipfile.ZipFile(zip_path) as zf:
+            return not test_members or zf.testzip() == None
+    except (zipfile.BadZipFile, OSError):
+        return False
+
+def download(source, file_name, target_path, checksum=None, retries=3, retry_wait=1.0, chunk_size=2**20):
+    """Stream 'file_name' from the source into 'target_path'. Data is written into '<target_path>.part' first, so interrupted or incomplete downloads (shorter than the length reported by the source) are resumed on retry or in a later call. The file is moved to 'target_path' only if its SHA-256 digest matches 'checksum' (if specified) and, for zip archives, if every member passes the CRC check."""
+    part_path = target_path + ".part"
+    for attempt in range(retries + 1):
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        try:
+            stream, resumed = source.open(file_name, offset)
+            with stream, open(part_path, "ab" if resumed else "wb") as f:
+                expected_length = get_stream_length(stream)
+                start = f.tell()
+                shutil.copyfileobj(stream, f, chunk_size)
+                received = f.tell() - start
+            if expected_length != None and received < expected_length:
+                raise ConnectionError("Incomplete download of '%s': %i of %i bytes received!" % (file_name, received, expected_length))
+            break
+        except (OSError, http.client.HTTPException) as e:
+            if attempt == retries or not is_transient_error(e):
+                raise
+            time.sleep(retry_wait * 2**attempt)
+    if checksum != None:
+        digest = file_checksum(part_path)
+        if digest != checksum:
+            os.remove(part_path)
+            raise RuntimeError("Checksum mismatch for '%s': expected %s, got %s!" % (file_name, checksum, digest))
+    if file_name.endswith(".zip") and not is_valid_archive(part_path, test_members=True):
+        os.remove(part_path)
+        raise RuntimeError("Downloaded archive '%s' is corrupted!" % file_name)
+    os.replace(part_path, target_path)
+    return target_path
+
+@contextmanager
+def file_lock(lock_path, timeout=None, poll_interval=0.1):
+    """Hold an exclusive lock on 'lock_path' so that parallel processes do not work on the same files. Raise RuntimeError if the lock is not acquired within 'timeout' seconds."""
+    try:
+        import fcntl
+    except ImportError:
+        fcntl = None
+    start = time.time()
+    if fcntl != None:
+        f = open(lock_path, "a")
+        try:
+            while True:
+                try:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except OSError:
+                    if timeout != None and time.time() - start > timeout:
+                        raise RuntimeError("Could not acquire lock '%s'!" % lock_path)
+                    time.sleep(poll_interval)
+            yield
+        finally:
+            # closing the file releases the lock
+            f.close()
+    else:
+        # systems without 'fcntl': the lock is the existence of the file
+        while True:
+            try:
+                fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                break
+            except FileExistsError:
+                if timeout != None and time.time() - start > timeout:
+                    raise RuntimeError("Could not acquire lock '%s'!" % lock_path)
+                time.sleep(poll_interval)
+        try:
+            yield
+        finally:
+            os.close(fd)
+            os.remove(lock_path)
+
+### EXTRACTION ###
+
+def extract_files(zip_path, output_dir, file_names, chunk_size=2**20):
+    """Extract the given files (by base name) from a zip archive into 'output_dir'. Members are streamed one by one and the rest of the archive is not unpacked."""
+    os.makedirs(output_dir, exist_ok=True)
+    with zipfile.ZipFile(zip_path) as zf:
+        for file_name in file_names:
+            target_path = os.path.join(output_dir, file_name)
+            if os.path.exists(target_path):
+                continue
+            fd, tmp_path = tempfile.mkstemp(dir=output_dir, prefix=".tmp_")
+            try:
+                with zf.open(find_member(zf, file_name)) as src, os.fdopen(fd, "wb") as dst:
+                    shutil.copyfileobj(src, dst, chunk_size)
+                os.replace(tmp_path, target_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+### DATA SETS ###
+
+def get_data_files(data_id):
+    return [file_name % data_id for file_name in DATA_FILES]
+
+def data_files_exist(data_dir, data_id, extracted=True):
+    """Check whether the data files of 'data_id' are in '<data_dir>/<data_id>'. With 'extracted=False' compressed files and the '<data_dir>/<data_id>.zip' archive are accepted as well (see 'find_data_file')."""
+    folder = os.path.join(data_dir, data_id)
+    if extracted:
+        return all(os.path.exists(os.path.join(folder, file_name)) for file_name in get_data_files(data_id))
+    return all(find_data_file(folder, file_name) != None for file_name in get_data_files(data_id))
+
+def fetch_data(data_dir, data_id, source=None, checksum=None, keep_archive=True, retries=3, extract=True):
+    """Download '<data_id>.zip' from the source (default: the public HTTP server) into 'data_dir' and extract the data files into '<data_dir>/<data_id>'. Use 'extract=False' to keep only the archive: 'TennisDataHandler' reads the files directly from it. The archive is verified with 'checksum' or the registered checksum in 'DATA_CHECKSUMS'. Parallel processes fetching the same data set wait for each other and share one download. Return the folder of the data files."""
+    output_dir = os.path.join(data_dir, data_id)
+    if data_files_exist(data_dir, data_id, extract):
+        return output_dir
+    os.makedirs(data_dir, exist_ok=True)
+    with file_lock(os.path.join(data_dir, ".%s.lock" % data_id)):
+        # another process may have fetched the data meanwhile
+        if data_files_exist(data_dir, data_id, extract):
+            return output_dir
+        source = get_source(source)
+        archive_name = "%s.zip" % data_id
+        archive_path = os.path.join(data_dir, archive_name)
+        if os.path.exists(archive_path) and not is_valid_archive(archive_path):
+            print("Archive '%s' is corrupted, it is downloaded again." % archive_path)
+            os.remove(archive_path)
+        if not os.path.exists(archive_path):
+            print("Downloading data from '%s' STARTED..." % source)
+            download(source, archive_name, archive_path, DATA_CHECKSUMS.get(data_id) if checksum == None else checksum, retries)
+            print("Data was DOWNLOADED!")
+        if extract:
+            try:
+                extract_files(archive_path, output_dir, get_data_files(data_id))
+            except zipfile.BadZipFile:
+                # the archive passed the checks above but a member is broken
+                os.remove(archive_path)
+                download(source, archive_name, archive_path, DATA_CHECKSUMS.get(data_id) if checksum == None else checksum, retries)
+                extract_files(archive_path, output_dir, get_data_files(data_id))
+            if not keep_archive:
+                os.remove(archive_path)
+    return output_dir
+
+def fetch_data_async(data_dir, data_id, source=None, checksum=None, keep_archive=True, retries=3, extract=True):
+    """Run 'fetch_data' in a background thread, e.g. to download the next tournament while the current one is processed. Return a 'concurrent.futures.Future' of the data folder."""
+    executor = ThreadPoolExecutor(max_workers=1)
+    future = executor.submit(fetch_data, data_dir, data_id, source, checksum, keep_archive, retries, extract)
+    executor.shutdown(wait=False)
+    return future
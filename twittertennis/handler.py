@@ -1,11 +1,20 @@
 import pandas as pd
 import numpy as np
-import networkx as nx
-import json, pytz, os
+import json, pytz, os, math, copy
+from functools import reduce, partial
 from collections import Counter
 from tqdm import tqdm
 from .tennis_utils import *
 from .handler_utils import *
+from .cache_utils import *
+from .export_utils import *
+from .stream import SnapshotStream
+from .dataset import SnapshotDataset
+from .edge_index import TemporalEdgeIndex
+from .compact import CompactMentions
+from .io_utils import read_mentions, find_data_file, open_data_file
+from .profiling import StageProfiler
+from .fetch import fetch_data, data_files_exist, get_data_files
 
 TIMEZONE = {
     "rg17": pytz.timezone('Europe/Paris'),
@@ -37,42 +46,110 @@ DATES_WITH_NO_GAMES = {
     "uo17": ["2017-08-26","2017-08-27"]
 }
 
+SCHEDULE_SEP = {
+    "rg17": "|",
+    "uo17": ";"
+}
+
+ALTERNATIVE_PLAYER_NAMES = {
+    "uo17": {
+        "Carla Suarez Navarro":"Carla Suárez Navarro",
+        "Coco Vandeweghe":"CoCo Vandeweghe",
+        "Juan Martin Del Potro":"Juan Martin del Potro",
+        "Diede De Groot":"Diede de Groot",
+        "Mariana Duque-Marino":"Mariana Duque-Mariño",
+        "Alex De Minaur":"Alex de Minaur",
+        "Tracy Austin-Holt":"Tracy Austin"
+    }
+}
+# reverse alternative name mapping for rg17
+ALTERNATIVE_PLAYER_NAMES["rg17"] = dict(zip(ALTERNATIVE_PLAYER_NAMES["uo17"].values(),ALTERNATIVE_PLAYER_NAMES["uo17"].keys()))
+
 class TennisDataHandler():
     
-    def __init__(self, data_dir, data_id, include_qualifiers=True, verbose=False):
+    def __init__(self, data_dir, data_id, include_qualifiers=True, verbose=False, use_cache=False, cache_dir=None, build_index=False, compact=False, csv_engine=None, chunksize=None, profile_hooks=None, data_source=None):
+        """Load and preprocess a tennis data set. The loading options are described in the README."""
+        self.profiler = StageProfiler(profile_hooks)
+        self._mentions = None
+        self.csv_engine = csv_engine
+        self.chunksize = chunksize
+        self._compact_mentions = None
         self.verbose = verbose
         self.data_id = data_id
         self.data_dir = data_dir + "/" + data_id
-        if not os.path.exists(self.data_dir):
-            bashCommand = """mkdir -p %s; cd %s; wget https://dms.sztaki.hu/~fberes/tennis/%s.zip; unzip %s.zip""" % (data_dir, data_dir, data_id, data_id)
-            print(bashCommand)
-            print("Downloading data from 'https://dms.sztaki.hu/~fberes/tennis' STARTED...")
-            os.system(bashCommand)
-            print("Data was DOWNLOADED!")
+        if not data_files_exist(data_dir, data_id, extracted=False):
+            with self.profiler.stage("fetch_data"):
+                fetch_data(data_dir, data_id, source=data_source, extract=False)
         self.include_qualifiers = include_qualifiers
-        self._load_files(self.data_id, self.data_dir)
-        self._filter_data()
-        self._extract_mappings()
-        self.weighted_edges, self.weighted_edges_grouped, self.edges_grouped = prepare_edges(self.mentions, "date")
-        #self._prepare_edges()
-        self.daily_p_dict, self.daily_p_df = extract_daily_players(self.schedule, self.player_accounts)
+        self.use_cache = use_cache
+        self.cache_dir = os.path.join(self.data_dir, "cache") if cache_dir == None else cache_dir
+        if not (use_cache and self._load_cache()):
+            with self.profiler.stage("load_files") as record:
+                self._load_files(self.data_id, self.data_dir)
+                record["rows"] = len(self.mentions)
+            with self.profiler.stage("filter_data") as record:
+                self._filter_data()
+                record["rows"] = self.number_of_edges
+            with self.profiler.stage("extract_mappings") as record:
+                self._extract_mappings()
+                record["rows"] = len(self.account_to_id)
+            with self.profiler.stage("prepare_edges") as record:
+                self.weighted_edges, self.weighted_edges_grouped, self.edges_grouped = prepare_edges(self.mentions, "date")
+                record["rows"] = len(self.weighted_edges)
+            #self._prepare_edges()
+            with self.profiler.stage("extract_daily_players", rows=len(self.schedule)):
+                self.daily_p_dict, self.daily_p_df = extract_daily_players(self.schedule, self.player_accounts)
+            if use_cache:
+                with self.profiler.stage("save_cache", rows=self.number_of_edges):
+                    self._save_cache()
+        if compact:
+            with self.profiler.stage("compact_mentions", rows=len(self._mentions)):
+                self._compact_mentions = CompactMentions(self._mentions)
+                self._mentions = None
+        self.edge_index = None
+        if build_index:
+            self.build_edge_index()
         
-    def _load_files(self, data_id, data_dir):
-        mention_file_path = "%s/%s_mentions_with_names.csv" % (data_dir, data_id)
-        tennis_match_file_path = "%s/%s_schedule.csv" % (data_dir, data_id)
-        player_assigments_path = "%s/%s_player_accounts.json" % (data_dir, data_id)
-        mentions = pd.read_csv(mention_file_path, sep="|")
-        mentions = mentions[["epoch","src","trg","src_screen_str", "trg_screen_str"]].sort_values("epoch")
-        self.mentions = mentions
-        if self.verbose:
-            print("\n### Load Twitter mentions ###")
-            print(self.mentions.head(3))
-        sep = "|" if data_id == "rg17" else ";"
-        self.schedule = pd.read_csv(tennis_match_file_path, sep=sep)
+    @property
+    def mentions(self):
+        """Twitter mentions of the data set. In compact mode the table is decoded on access with categorical screen name and date columns."""
+        if self._compact_mentions != None:
+            return self._compact_mentions.to_frame()
+        return self._mentions
+    
+    @mentions.setter
+    def mentions(self, mentions):
+        self._mentions = mentions
+        self._compact_mentions = None
+
+    def _get_mention_store(self):
+        # the compact representation is not decoded
+        return self._mentions if self._compact_mentions == None else self._compact_mentions
+        
+    def _get_file_locations(self, data_id, data_dir):
+        """Locate the mention, schedule and player account files. They are read directly from compressed files or from the zip archive of the data set if they are not extracted (see 'find_data_file')."""
+        locations = []
+        for file_name in get_data_files(data_id):
+            location = find_data_file(data_dir, file_name)
+            if location == None:
+                raise RuntimeError("'%s' was not found in '%s'!" % (file_name, data_dir))
+            locations.append(location)
+        return locations
+        
+    def _load_files(self, data_id, data_dir, load_mentions=True):
+        mention_file, tennis_match_file, player_assigments_file = self._get_file_locations(data_id, data_dir)
+        if load_mentions:
+            self.mentions = self._read_mentions(mention_file)
+            if self.verbose:
+                print("\n### Load Twitter mentions ###")
+                print(self.mentions.head(3))
+        sep = SCHEDULE_SEP.get(data_id, ";")
+        with open_data_file(*tennis_match_file) as f:
+            self.schedule = pd.read_csv(f, sep=sep)
         if self.verbose:
             print("\n### Load event schedule ###")
             print(self.schedule.head(3))
-        with open(player_assigments_path) as f:
+        with open_data_file(*player_assigments_file) as f:
             self.player_accounts = json.load(f)
             if self.verbose:
                 print("\n### Load player accounts ###")
@@ -80,14 +157,34 @@ class TennisDataHandler():
         if self.verbose:
             print("Done")
         
-    def _filter_data(self):
+    def _read_mentions(self, mention_file):
+        if self.chunksize != None:
+            # out-of-range mentions are dropped during ingestion, thus the result cannot be shared
+            start_time, end_time = self._get_time_range()
+            with open_data_file(*mention_file) as f:
+                return read_mentions(f, start_time, end_time, engine=self.csv_engine, chunksize=self.chunksize)
+        source_cache_path = self._get_cache_path(SOURCE_VARIANT) if self.use_cache else None
+        if source_cache_path != None:
+            cached = load_cache(source_cache_path, ["mentions"])
+            if cached != None:
+                return cached[0]["mentions"]
+        with open_data_file(*mention_file) as f:
+            mentions = read_mentions(f, engine=self.csv_engine)
+        if source_cache_path != None:
+            save_cache(source_cache_path, {"mentions":mentions}, {})
+            clear_cache(self.cache_dir, self.data_id, SOURCE_VARIANT, keep=os.path.basename(source_cache_path).split("_")[-1])
+        return mentions
+        
+    def _get_time_range(self):
         if self.include_qualifiers:
-            self.start_time = QUALIFIER_START[self.data_id]
-            self.dates = DATES_WITH_QUALIFIERS[self.data_id]
+            start_time, dates = QUALIFIER_START[self.data_id], DATES_WITH_QUALIFIERS[self.data_id]
         else:
-            self.start_time = TOURNAMENT_START[self.data_id]
-            self.dates = DATES_WITHOUT_QUALIFIERS[self.data_id]
-        self.end_time = self.start_time + 86400 * len(self.dates)
+            start_time, dates = TOURNAMENT_START[self.data_id], DATES_WITHOUT_QUALIFIERS[self.data_id]
+        return start_time, start_time + 86400 * len(dates)
+        
+    def _set_time_range(self):
+        self.start_time, self.end_time = self._get_time_range()
+        self.dates = DATES_WITH_QUALIFIERS[self.data_id] if self.include_qualifiers else DATES_WITHOUT_QUALIFIERS[self.data_id]
         self.dates_with_no_games = DATES_WITH_NO_GAMES[self.data_id]
         if self.verbose:
             print("\n### Filter data ###")
@@ -96,9 +193,12 @@ class TennisDataHandler():
             print("Number of days:", len(self.dates))
             print("Dates:", self.dates)
             print("Dates with no games:", self.dates_with_no_games)
+        
+    def _filter_data(self):
+        self._set_time_range()
         mentions = self.mentions
         mentions = mentions[(mentions["epoch"] >= self.start_time) & (mentions["epoch"] <= self.end_time)]
-        mentions = mentions.assign(date=mentions["epoch"].apply(lambda x: epoch2date(x, TIMEZONE[self.data_id])))
+        mentions = mentions.assign(date=epochs2dates(mentions["epoch"].values, TIMEZONE[self.data_id]))
         self.number_of_edges = len(mentions)
         self.number_of_nodes = len(set(mentions["src"]).union(set(mentions["trg"])))
         self.mentions = mentions
@@ -108,37 +208,155 @@ class TennisDataHandler():
             #print("Min epoch:", mentions["epoch"].min(), "Max epoch:", mentions["epoch"].max())
         
     def _extract_mappings(self):
+        self._extract_mappings_from(self.mentions)
+        
+    def _extract_mappings_from(self, mentions):
         # account to id
-        mentions = self.mentions
-        targets = list(zip(mentions["trg_screen_str"], mentions["trg"]))
-        sources = list(zip(mentions["src_screen_str"], mentions["src"]))
-        self.account_to_id = dict(sources+targets)
+        src, trg = mentions["src"].tolist(), mentions["trg"].tolist()
+        src_screen_str, trg_screen_str = mentions["src_screen_str"].tolist(), mentions["trg_screen_str"].tolist()
+        # sources first, then targets: the last occurrence wins
+        self.account_to_id = dict(zip(src_screen_str + trg_screen_str, src + trg))
         #print(len(self.account_to_id))
         #self.id_to_account = dict(zip(self.account_to_id.values(), self.account_to_id.keys()))
-        rev_targets = list(zip(mentions["trg"],mentions["trg_screen_str"]))
-        rev_sources = list(zip(mentions["src"],mentions["src_screen_str"]))
-        self.id_to_account = dict(rev_sources+rev_targets)
+        self.id_to_account = dict(zip(src + trg, src_screen_str + trg_screen_str))
         nodes = list(self.account_to_id.values())
+        self._extract_player_mapping()
+        
+    def _extract_player_mapping(self):
         # tennis account to player
         tennis_account_to_player = {}
-        alternative_players = {}
-        alternative_players["uo17"] = {
-            "Carla Suarez Navarro":"Carla Suárez Navarro",
-            "Coco Vandeweghe":"CoCo Vandeweghe",
-            "Juan Martin Del Potro":"Juan Martin del Potro",
-            "Diede De Groot":"Diede de Groot",
-            "Mariana Duque-Marino":"Mariana Duque-Mariño",
-            "Alex De Minaur":"Alex de Minaur",
-            "Tracy Austin-Holt":"Tracy Austin"
-        }
-        # reverse alternative name mapping for rg17
-        alternative_players["rg17"] = dict(zip(alternative_players["uo17"].values(),alternative_players["uo17"].keys()))
+        alternative_players = ALTERNATIVE_PLAYER_NAMES.get(self.data_id, {})
         for p, account_names in self.player_accounts.items():
-            cleaned_p = alternative_players[self.data_id].get(p, p)
+            cleaned_p = alternative_players.get(p, p)
             for a_name in account_names:
                 tennis_account_to_player[a_name] = cleaned_p
         self.tennis_account_to_player = tennis_account_to_player
     
+    def _get_cache_path(self, variant=None):
+        variant = self.include_qualifiers if variant == None else variant
+        source_files = [file_path for file_path, member in self._get_file_locations(self.data_id, self.data_dir)]
+        key = get_cache_key(self.data_id, variant, source_files, None if variant == SOURCE_VARIANT else self._get_cache_params())
+        return get_cache_path(self.cache_dir, self.data_id, variant, key)
+    
+    def _get_cache_params(self):
+        # the preprocessed data depends on the tournament configuration (see 'register_tournament')
+        start_time, end_time = self._get_time_range()
+        return {
+            "start_time": start_time,
+            "end_time": end_time,
+            "dates": DATES_WITH_QUALIFIERS[self.data_id] if self.include_qualifiers else DATES_WITHOUT_QUALIFIERS[self.data_id],
+            "timezone": str(TIMEZONE[self.data_id]),
+            "schedule_sep": SCHEDULE_SEP.get(self.data_id, ";"),
+        }
+    
+    def _load_cache(self):
+        with self.profiler.stage("load_cache") as record:
+            loaded = self._load_cache_entry()
+            record["rows"] = self.number_of_edges if loaded else 0
+        return loaded
+    
+    def _load_cache_entry(self):
+        cache_path = self._get_cache_path()
+        cached = load_cache(cache_path)
+        if cached == None:
+            return False
+        tables, meta = cached
+        self._load_files(self.data_id, self.data_dir, load_mentions=False)
+        self._set_time_range()
+        self.mentions = tables["mentions"]
+        self.number_of_edges = meta["number_of_edges"]
+        self.number_of_nodes = meta["number_of_nodes"]
+        self.account_to_id = table_to_dict(tables["account_to_id"], "account", "id")
+        self.id_to_account = table_to_dict(tables["id_to_account"], "id", "account")
+        self._extract_player_mapping()
+        self.weighted_edges = tables["weighted_edges"]
+        self.weighted_edges_grouped = group_edges(self.weighted_edges, "date")
+        self.edges_grouped = group_edges(self.mentions[["src","trg","date"]], "date")
+        self.daily_p_dict = meta["daily_p_dict"]
+        self.daily_p_df = daily_players_to_df(self.daily_p_dict, self.player_accounts)
+        if self.verbose:
+            print("\n### Preprocessed data was loaded from cache ###")
+            print(cache_path)
+        return True
+    
+    def _save_cache(self):
+        cache_path = self._get_cache_path()
+        tables = {
+            "mentions": self.mentions,
+            "weighted_edges": self.weighted_edges,
+            "account_to_id": dict_to_table(self.account_to_id, "account", "id"),
+            "id_to_account": dict_to_table(self.id_to_account, "id", "account"),
+        }
+        meta = {
+            "number_of_edges": self.number_of_edges,
+            "number_of_nodes": self.number_of_nodes,
+            "daily_p_dict": self.daily_p_dict,
+        }
+        save_cache(cache_path, tables, meta)
+        # entries of outdated source files are not needed anymore
+        clear_cache(self.cache_dir, self.data_id, self.include_qualifiers, keep=os.path.basename(cache_path).split("_")[-1])
+        if self.verbose:
+            print("\n### Preprocessed data was saved to cache ###")
+            print(cache_path)
+        
+    def profile_report(self):
+        """Summary of the profiled stages: number of calls, total wall time (seconds), processed rows and memory delta (MB) per stage. The raw records are available in 'profiler.records'."""
+        return self.profiler.report()
+        
+    def clear_cache(self):
+        """Remove every cached entry of this data set (with and without qualifiers, and the parsed source files)."""
+        return clear_cache(self.cache_dir, self.data_id)
+    
+    def restrict(self, dates):
+        """Return a new handler over 'dates' (a contiguous part of 'self.dates') without reloading the data. The range starts at the local midnight of the first date, just like in '_set_time_range', and it includes qualifiers if it starts before the main tournament. Mentions are sliced, and the per-date edge groups of the retained dates are shared with this handler. Only the account mappings are recomputed."""
+        date_positions = [self.dates.index(date) if date in self.dates else -1 for date in dates]
+        if len(dates) == 0 or -1 in date_positions or date_positions != list(range(date_positions[0], date_positions[0] + len(dates))):
+            raise RuntimeError("'dates' must be a contiguous part of the dates of the handler!")
+        start_time = local_midnight(dates[0], TIMEZONE[self.data_id])
+        end_time = start_time + 86400 * len(dates)
+        handler = copy.copy(self)
+        handler.profiler = StageProfiler(self.profiler.hooks)
+        handler.start_time, handler.end_time, handler.dates = start_time, end_time, list(dates)
+        handler.include_qualifiers = start_time < TOURNAMENT_START[self.data_id]
+        with handler.profiler.stage("restrict") as record:
+            # mentions are ordered by epoch
+            mentions = self.mentions
+            epochs = mentions["epoch"].values
+            start, end = np.searchsorted(epochs, start_time, side="left"), np.searchsorted(epochs, end_time, side="right")
+            mentions = mentions.iloc[start:end]
+            handler.number_of_edges = len(mentions)
+            handler.number_of_nodes = len(np.unique(np.concatenate([mentions["src"].values, mentions["trg"].values])))
+            handler._extract_mappings_from(mentions)
+            # the groups of the retained dates can be shared if no mentions of these dates were cut off
+            date_counts = mentions["date"].value_counts()
+            date_counts = date_counts[date_counts > 0]
+            retained_dates = [date for date in date_counts.index if date in self.edges_grouped]
+            if len(retained_dates) == len(date_counts) and all(date_counts[date] == len(self.edges_grouped[date]) for date in retained_dates):
+                retained_dates = [date for date in self.edges_grouped if date in date_counts.index]
+                handler.edges_grouped = {date:self.edges_grouped[date] for date in retained_dates}
+                handler.weighted_edges_grouped = {date:self.weighted_edges_grouped[date] for date in retained_dates}
+                positions = np.flatnonzero(self.weighted_edges["date"].isin(retained_dates).values)
+                if len(positions) > 0 and positions[-1] - positions[0] + 1 == len(positions):
+                    weighted_edges = self.weighted_edges.iloc[positions[0]:positions[-1]+1]
+                else:
+                    weighted_edges = self.weighted_edges.iloc[positions]
+                handler.weighted_edges = weighted_edges.reset_index(drop=True)
+            else:
+                handler.weighted_edges, handler.weighted_edges_grouped, handler.edges_grouped = prepare_edges(mentions, "date")
+            if self._compact_mentions != None:
+                handler._compact_mentions, handler._mentions = CompactMentions(mentions), None
+            else:
+                handler._mentions, handler._compact_mentions = mentions, None
+            handler.edge_index = None
+            if self.edge_index != None:
+                handler.build_edge_index()
+            record["rows"] = handler.number_of_edges
+        return handler
+    
+    def without_qualifiers(self):
+        """Return the data set without qualifiers (see 'restrict'). The result is the same as loading the data with 'include_qualifiers=False'."""
+        return self.restrict(DATES_WITHOUT_QUALIFIERS[self.data_id])
+    
     def summary(self):
         """Show the data summary"""
         return {
@@ -176,7 +394,7 @@ class TennisDataHandler():
         """Show daily information about tennis players"""
         return self.daily_p_df[self.daily_p_df["date"].isin(self.dates)]
     
-    def get_daily_relevance_labels(self, binary=True):
+    def _get_label_mappers(self, binary=True):
         if binary:
             label_value_dict = {"current":1.0, "previous":0.0, "next":0.0}
         else:
@@ -185,49 +403,100 @@ class TennisDataHandler():
         for d in self.dates_with_no_games:
             daily_found_player_dict[d] = []
         mapper_dicts = (self.tennis_account_to_player, self.account_to_id, daily_found_player_dict)
-        daily_label_dicts = get_daily_label_dicts(label_value_dict, self.dates, self.mentions, mapper_dicts, self.verbose)
+        return label_value_dict, mapper_dicts
+    
+    def get_relevance_label_matrix(self, binary=True):
+        """Get node relevance labels in sparse coordinate format: node ids with the day indices, node indices and values of the non-zero labels"""
+        label_value_dict, mapper_dicts = self._get_label_mappers(binary)
+        with self.profiler.stage("relevance_labels") as record:
+            label_matrix = get_relevance_label_matrix(label_value_dict, self.dates, mapper_dicts)
+            record["rows"] = len(label_matrix[3])
+        return label_matrix
+    
+    def get_daily_relevance_labels(self, binary=True):
+        label_value_dict, mapper_dicts = self._get_label_mappers(binary)
+        with self.profiler.stage("daily_relevance_labels", rows=len(self.account_to_id) * len(self.dates)):
+            daily_label_dicts = get_daily_label_dicts(label_value_dict, self.dates, self._get_mention_store(), mapper_dicts, self.verbose)
         return daily_label_dicts
     
-    def export_relevance_labels(self, output_dir, binary=True, only_pos_label=False):
-        """Export label files for each date. Use 'only_pos_label=True' if you want to export only the relevant nodes per day."""
-        daily_label_dicts = self.get_daily_relevance_labels(binary)
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
-            print("%s folder was created." % output_dir)
-        with open("%s/summary.json" % output_dir, 'w') as f:
-            json.dump(self.summary(), f, indent="   ", sort_keys=False)
-        #pd.DataFrame(list(self.account_to_id.items())).sort_values(0).to_csv("%s/account_to_id.csv" % output_dir, index=False)
-        #pd.DataFrame(list(self.tennis_account_to_player.items())).sort_values(0).to_csv("%s/tennis_account_to_player.csv" % output_dir, index=False)
-        print("Exporting files STARTED")
-        for i, date in enumerate(self.dates):
-            sorted_user_labels = []
-            for u in sorted(daily_label_dicts[date].keys()):
-                label_value = daily_label_dicts[date][u]
-                if only_pos_label:
-                    # export only positive user labels
-                    if label_value > 0.0:
-                        sorted_user_labels.append((u, label_value))
-                else:
-                    sorted_user_labels.append((u, label_value))
-            print(date, len(sorted_user_labels))
-            scores2file(sorted_user_labels,"%s/labels_%i.csv" % (output_dir, i))
-        print("Exporting files DONE")
+    def export_relevance_labels(self, output_dir, binary=True, only_pos_label=False, single_file=False, file_format="csv"):
+        """Export label files for each date. Use 'only_pos_label=True' if you want to export only the relevant nodes per day. Use 'single_file=True' to write the labels of every day into one 'labels.csv' file with 'day_index', 'node_id' and 'label' columns. Use 'file_format="parquet"' or 'file_format="arrow"' (Arrow IPC) to write the labels into '<output_dir>/labels' partitioned by day and the summary into a 'summary.<ext>' table instead (see 'write_partitioned_labels'). Columnar formats require 'pyarrow'."""
+        check_file_format(file_format)
+        with self.profiler.stage("export_relevance_labels") as record:
+            label_columns = get_label_columns(*self.get_relevance_label_matrix(binary), len(self.dates), only_pos_label)
+            record["rows"] = len(label_columns["label"])
+            if not os.path.exists(output_dir):
+                os.makedirs(output_dir)
+                print("%s folder was created." % output_dir)
+            with open("%s/summary.json" % output_dir, 'w') as f:
+                json.dump(self.summary(), f, indent="   ", sort_keys=False)
+            #pd.DataFrame(list(self.account_to_id.items())).sort_values(0).to_csv("%s/account_to_id.csv" % output_dir, index=False)
+            #pd.DataFrame(list(self.tennis_account_to_player.items())).sort_values(0).to_csv("%s/tennis_account_to_player.csv" % output_dir, index=False)
+            print("Exporting files STARTED")
+            if file_format != "csv":
+                write_summary_table("%s/summary.%s" % (output_dir, COLUMNAR_FORMATS[file_format]), self.summary(), file_format)
+                write_partitioned_labels("%s/labels" % output_dir, label_columns, self.dates, binary, file_format)
+            elif single_file:
+                write_label_table("%s/labels.csv" % output_dir, label_columns)
+            else:
+                write_daily_label_files(output_dir, label_columns, self.dates)
+            print("Exporting files DONE")
         
-    def export_edges(self, output_dir, sep="|"):
-        """Export edges (mentions) into file. Only time and node identifiers will be expoerted!"""
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
-            print("%s folder was created." % output_dir)
-        with open("%s/summary.json" % output_dir, 'w') as f:
-            json.dump(self.summary(), f, indent="   ", sort_keys=False)
-        self.mentions[["epoch","src","trg"]].to_csv("%s/edges.csv" % output_dir, index=False, header=False, sep=sep)
+    def export_edges(self, output_dir, sep="|", file_format="csv", delta_t=3*3600):
+        """Export edges (mentions) into file. Only time and node identifiers will be expoerted! Use 'file_format="parquet"' or 'file_format="arrow"' (Arrow IPC) to write the edges into '<output_dir>/edges' partitioned by day with additional 'day_index' and 'snapshot' (index of the 'delta_t' long time period, see 'to_json') columns, and the summary into a 'summary.<ext>' table (see 'write_partitioned_edges'). Columnar formats require 'pyarrow'."""
+        check_file_format(file_format)
+        with self.profiler.stage("export_edges", rows=self.number_of_edges):
+            if not os.path.exists(output_dir):
+                os.makedirs(output_dir)
+                print("%s folder was created." % output_dir)
+            with open("%s/summary.json" % output_dir, 'w') as f:
+                json.dump(self.summary(), f, indent="   ", sort_keys=False)
+            if file_format == "csv":
+                self.mentions[["epoch","src","trg"]].to_csv("%s/edges.csv" % output_dir, index=False, header=False, sep=sep)
+            else:
+                write_summary_table("%s/summary.%s" % (output_dir, COLUMNAR_FORMATS[file_format]), self.summary(), file_format)
+                write_partitioned_edges("%s/edges" % output_dir, self.mentions, self.dates, self.start_time, delta_t, file_format)
         
+    def build_edge_index(self):
+        """Build a temporal edge index over the mentions. Time range queries, snapshot extraction and account recoding use binary search on the index afterwards instead of scanning every mention."""
+        self.edge_index = TemporalEdgeIndex(self._get_mention_store())
+        return self.edge_index
+    
+    def _get_edge_index(self):
+        if self.edge_index == None:
+            self.build_edge_index()
+        return self.edge_index
+    
+    def edges_between(self, t0=None, t1=None):
+        """Get the mentions in the [t0, t1) time range"""
+        return self._get_edge_index().edges_between(t0, t1)
+    
+    def active_nodes(self, t0=None, t1=None):
+        """Get the identifiers of the accounts that were active in the [t0, t1) time range"""
+        return self._get_edge_index().active_nodes(t0, t1)
+    
+    def neighbors(self, account, t0=None, t1=None):
+        """Get the identifiers of the accounts that mentioned or were mentioned by the given account (screen name or node identifier) in the [t0, t1) time range"""
+        node_id = self.account_to_id[account] if isinstance(account, str) else account
+        return self._get_edge_index().neighbors(node_id, t0, t1)
+    
+    def get_num_nodes(self, date):
+        """Get the number of active accounts for the given date"""
+        if self.edge_index != None:
+            start, end = self.edge_index.date_range(date)
+            return len(self.edge_index.nodes_in_range(start, end))
+        else:
+            return get_num_nodes(self.mentions, date)
+    
     def get_account_recoder(self, k=None, src_col="src_screen_str", trg_col="trg_screen_str", exclude_final_day=True):
-        mentions = self.mentions.copy()
         enabled_dates = self.dates.copy()
         if exclude_final_day:
             enabled_dates = enabled_dates[:-1]
-        mentions = mentions[mentions["date"].isin(enabled_dates)]
+        if self.edge_index != None:
+            start, end = self.edge_index.date_range(enabled_dates[0], enabled_dates[-1])
+            mentions = self.edge_index.edges_in_range(start, end)
+        else:
+            mentions = self.mentions[self.mentions["date"].isin(enabled_dates)]
         mention_activity = list(mentions[src_col]) + list(mentions[trg_col])
         cnt = Counter(mention_activity)
         if k == None:
@@ -237,93 +506,168 @@ class TennisDataHandler():
         node_mapping = dict(zip(accounts,range(len(accounts))))
         return node_mapping
     
-    def _get_snapshot_edges(self, snapshot_id, grouped_data, edge_type="temporal", account_to_index=None):
+    def _get_snapshot_edge_arrays(self, snapshot_id, grouped_data, edge_type="temporal", account_to_index=None, index_lookup=None):
         edges_grouped, weighted_edges_grouped = grouped_data
-        snap_edges = []
         if edge_type == "temporal":
             df = edges_grouped[snapshot_id]
-            src, trg = reindex_edges(df, self.id_to_account, account_to_index)
-            weights = list(np.ones(len(df)))
+            src, trg = reindex_edges(df, self.id_to_account, account_to_index, index_lookup=index_lookup)
+            weights = np.ones(len(df))
         else:
             df = weighted_edges_grouped[snapshot_id]
-            src, trg = reindex_edges(df, self.id_to_account, account_to_index)
+            src, trg = reindex_edges(df, self.id_to_account, account_to_index, index_lookup=index_lookup)
             if edge_type == "weighted":
-                weights = list(df["weight"])
+                weights = df["weight"].values
             else:
-                weights = list(np.ones(len(df)))
-        snap_edges = list(zip(src, trg))
+                weights = np.ones(len(df))
+        snap_edges = np.column_stack([src.values, trg.values]).astype("int64")
         weights = weights[:len(snap_edges)]
-        G = nx.Graph()
-        G.add_edges_from(snap_edges)
-        if account_to_index == None:
-            X = calculate_node_features(G, None)
-        else:
-            X = calculate_node_features(G, len(account_to_index))
-        return snap_edges, weights, X
+        return snap_edges, weights
     
     def extract_snapshots(self, delta_t):
         start_epoch = self.start_time
         days = len(self.dates)
         to_epoch = start_epoch+days*86400+delta_t
         splits=list(range(start_epoch,to_epoch,delta_t))
-        mentions = self.mentions.copy()
-        mentions = mentions[mentions["date"].isin(self.dates)]
+        if self.edge_index != None:
+            start, end = self.edge_index.date_range(self.dates[0], self.dates[-1])
+            mentions = self.edge_index.edges_in_range(start, end).copy()
+        else:
+            mentions = self.mentions[self.mentions["date"].isin(self.dates)].copy()
         epochs = np.array(mentions["epoch"])
         snapshots_ids = pd.cut(epochs, splits, right=False, labels=range(len(splits)-1))
         mentions["snapshot_id"] = snapshots_ids
         return mentions
 
-    def get_data(self, binary_label=True, edge_type="weighted",  max_snapshot_idx=None, top_k_nodes=None):
+    def _get_classification_inputs(self, binary_label=True):
         snapshots = self.dates
         labels = self.get_daily_relevance_labels(binary=binary_label)
         grouped_data = (self.edges_grouped, self.weighted_edges_grouped)
-        return self._prepare_json_data(snapshots, self.mentions, grouped_data, labels, edge_type, max_snapshot_idx, top_k_nodes)
+        return snapshots, grouped_data, labels
     
-    def get_regression_data(self, delta_t=3*3600, edge_type="weighted", max_snapshot_idx=None, top_k_nodes=None):
+    def _get_regression_inputs(self, delta_t=3*3600):
         mentions = self.extract_snapshots(delta_t)
         snapshots = sorted(list(mentions["snapshot_id"].unique()))
         labels = regression_labels(mentions, "snapshot_id")
         weighted_edges, weighted_edges_grouped, edges_grouped = prepare_edges(mentions, "snapshot_id")
         grouped_data = (edges_grouped, weighted_edges_grouped)
-        return self._prepare_json_data(snapshots, mentions, grouped_data, labels, edge_type, max_snapshot_idx, top_k_nodes)
-        
-    def _prepare_json_data(self, snapshots, mentions, grouped_data, labels, edge_type, max_snapshot_idx, top_k_nodes):
-        snaps = snapshots.copy()
-        account_to_index = self.get_account_recoder(k=top_k_nodes)
+        return snapshots, grouped_data, labels
+    
+    def _get_task_inputs(self, task="classification", delta_t=3*3600):
+        with self.profiler.stage("%s_inputs" % task) as record:
+            if task == "classification":
+                task_inputs = self._get_classification_inputs(True)
+            else:
+                task_inputs = self._get_regression_inputs(delta_t)
+            record["rows"] = len(task_inputs[0])
+        return task_inputs
+    
+    def _get_multi_regression_inputs(self, delta_ts=None, windows=None):
+        specs = {}
+        for delta_t in ([] if delta_ts == None else delta_ts):
+            specs[delta_t] = (delta_t, delta_t)
+        for window, stride in ([] if windows == None else windows):
+            specs[(window, stride)] = (window, stride)
+        if len(specs) == 0:
+            raise RuntimeError("Specify at least one snapshot resolution with 'delta_ts' or 'windows'!")
+        # every resolution is derived from the aggregates of the finest compatible buckets
+        base_delta = reduce(math.gcd, [size for spec in specs.values() for size in spec])
+        mentions = self.mentions[self.mentions["date"].isin(self.dates)]
+        mentions = mentions.assign(bucket=(mentions["epoch"].values - self.start_time) // base_delta)
+        base_edges, base_labels = aggregate_base_buckets(mentions, "bucket")
+        inputs = {}
+        for key, (window, stride) in specs.items():
+            snapshots, grouped_data, labels = prepare_window_snapshots(mentions, base_edges, base_labels, self.start_time, window, stride, base_delta, "bucket")
+            inputs[key] = (snapshots, grouped_data, labels)
+        return inputs
+    
+    def get_data(self, binary_label=True, edge_type="weighted",  max_snapshot_idx=None, top_k_nodes=None, n_jobs=None, backend="networkx"):
+        snapshots, grouped_data, labels = self._get_classification_inputs(binary_label)
+        return self._prepare_json_data(snapshots, grouped_data, labels, edge_type, max_snapshot_idx, top_k_nodes, n_jobs, backend)
+    
+    def get_regression_data(self, delta_t=3*3600, edge_type="weighted", max_snapshot_idx=None, top_k_nodes=None, n_jobs=None, backend="networkx"):
+        snapshots, grouped_data, labels = self._get_regression_inputs(delta_t)
+        return self._prepare_json_data(snapshots, grouped_data, labels, edge_type, max_snapshot_idx, top_k_nodes, n_jobs, backend)
+    
+    def get_multi_regression_data(self, delta_ts=[3600, 3*3600, 6*3600, 24*3600], windows=None, edge_type="weighted", max_snapshot_idx=None, top_k_nodes=None, n_jobs=None, backend="networkx"):
+        """Prepare regression data for multiple snapshot resolutions in a single pass over the mentions. Non-overlapping snapshots are specified by 'delta_ts', sliding windows by (window, stride) pairs in 'windows'. The result is keyed by 'delta_t' and (window, stride) respectively, each value has the same format as the output of 'get_regression_data'."""
+        inputs = self._get_multi_regression_inputs(delta_ts, windows)
         data = {}
-        idx = 0
+        for key, (snapshots, grouped_data, labels) in inputs.items():
+            data[key] = self._prepare_json_data(snapshots, grouped_data, labels, edge_type, max_snapshot_idx, top_k_nodes, n_jobs, backend)
+        return data
+    
+    def _iter_json_data(self, snapshots, grouped_data, labels, edge_type, max_snapshot_idx, account_to_index, n_jobs=None, backend="networkx"):
+        """Generate the data of each snapshot one by one. Node features are computed in 'n_jobs' parallel processes (use -1 for all CPUs) with the 'networkx' or 'sparse' backend."""
+        snaps = snapshots.copy()
+        index_lookup = get_index_lookup(self.id_to_account, account_to_index)
         if max_snapshot_idx != None:
             snaps = snaps[:max_snapshot_idx]
-        for idx, snapshot_id in tqdm(enumerate(snaps)):
-            edges, weights, X = self._get_snapshot_edges(snapshot_id, grouped_data, edge_type, account_to_index)
-            X = list([X[node] for node in range(len(account_to_index))])
-            X = X[:len(account_to_index)]
-            y = reindex_labels(labels[snapshot_id], self.id_to_account, account_to_index)
-            y = list([y.get(node,0) for node in range(len(account_to_index))])
-            y = y[:len(account_to_index)]
-            data[str(idx)] = {
-                "index":idx,
-                #"date":date,
-                "edges": edges,
-                "weights": weights,
-                "y": y,
-                "X": X,
-            }
+        edge_iter = (self._get_snapshot_edge_arrays(snapshot_id, grouped_data, edge_type, account_to_index, index_lookup) for snapshot_id in snaps)
+        feature_iter = self.profiler.profile_iter("snapshot_features", map_snapshot_features(edge_iter, len(account_to_index), n_jobs, backend))
+        for idx, ((edges, weights, X), snapshot_id) in tqdm(enumerate(zip(feature_iter, snaps))):
+            yield format_snapshot(idx, edges, weights, X, labels[snapshot_id], self.id_to_account, account_to_index, index_lookup)
             #if self.include_qualifiers:
             #    data[str(idx)]["game_day"] = not date in self.dates_with_no_games 
-            idx += 1
+        
+    def snapshot_stream(self, delta_t=3*3600, edge_type="weighted", top_k_nodes=None, backend="networkx"):
+        """Create an online snapshot generator with the node mapping of this data set. Feeding the (epoch, src, trg) mentions into 'SnapshotStream.process' yields the same snapshots as 'get_regression_data'."""
+        account_to_index = self.get_account_recoder(k=top_k_nodes)
+        return SnapshotStream(self.start_time, delta_t, self.id_to_account, account_to_index, edge_type, self.end_time, backend)
+    
+    def _get_snapshot(self, idx, snapshots, grouped_data, labels, edge_type, account_to_index, index_lookup, backend="networkx"):
+        snapshot_id = snapshots[idx]
+        edges, weights = self._get_snapshot_edge_arrays(snapshot_id, grouped_data, edge_type, account_to_index, index_lookup)
+        with self.profiler.stage("snapshot_features", rows=1):
+            X = edges_to_node_features(edges, len(account_to_index), backend)
+        return format_snapshot(idx, edges, weights, X, labels[snapshot_id], self.id_to_account, account_to_index, index_lookup)
+    
+    def get_snapshot_dataset(self, task="classification", delta_t=3*3600, edge_type="weighted", max_snapshot_idx=None, top_k_nodes=None, backend="networkx", cache_size=16):
+        """Get a lazy 'SnapshotDataset' of the classification or regression data. Snapshots are computed on demand when they are indexed or iterated, and the last 'cache_size' snapshots are cached."""
+        snapshots, grouped_data, labels = self._get_task_inputs(task, delta_t)
+        snapshots = snapshots.copy()
+        if max_snapshot_idx != None:
+            snapshots = snapshots[:max_snapshot_idx]
+        account_to_index = self.get_account_recoder(k=top_k_nodes)
+        index_lookup = get_index_lookup(self.id_to_account, account_to_index)
+        snapshot_func = partial(self._get_snapshot, snapshots=snapshots, grouped_data=grouped_data, labels=labels, edge_type=edge_type, account_to_index=account_to_index, index_lookup=index_lookup, backend=backend)
+        return SnapshotDataset(snapshot_func, len(snapshots), account_to_index, cache_size)
+    
+    def _prepare_json_data(self, snapshots, grouped_data, labels, edge_type, max_snapshot_idx, top_k_nodes, n_jobs=None, backend="networkx"):
+        account_to_index = self.get_account_recoder(k=top_k_nodes)
+        data = {}
+        for snapshot in self._iter_json_data(snapshots, grouped_data, labels, edge_type, max_snapshot_idx, account_to_index, n_jobs, backend):
+            data[str(snapshot["index"])] = snapshot
         data["time_periods"] = len(data)
         data["node_ids"] = account_to_index
         return data
     
-    def to_json(self, path, task="classification", delta_t=3*3600, edge_type="weighted", max_snapshot_idx=None, top_k_nodes=None):
-        if task == "classification":
-            print("Preparing classification data...")
-            data = self.get_data(True, edge_type,  max_snapshot_idx, top_k_nodes)
-        else:
-            print("Preparing regression data...")
-            data = self.get_regression_data(delta_t, edge_type,  max_snapshot_idx, top_k_nodes)
-        with open(path, 'w') as f:
-            json.dump(data, f)
+    def to_json(self, path, task="classification", delta_t=3*3600, edge_type="weighted", max_snapshot_idx=None, top_k_nodes=None, lines=False, n_jobs=None, backend="networkx"):
+        """Export snapshots into a JSON file. Snapshots are prepared and written one by one, thus only a single snapshot is kept in memory. The file content is the same as 'json.dump' of the output of 'get_data' (classification) or 'get_regression_data' (regression). Use 'lines=True' to write one snapshot per line (NDJSON) followed by a line with the 'time_periods' and 'node_ids' fields."""
+        print("Preparing %s data..." % task)
+        snapshots, grouped_data, labels = self._get_task_inputs(task, delta_t)
+        account_to_index = self.get_account_recoder(k=top_k_nodes)
+        snapshot_iter = self._iter_json_data(snapshots, grouped_data, labels, edge_type, max_snapshot_idx, account_to_index, n_jobs, backend)
+        with self.profiler.stage("export_json") as record:
+            with open(path, 'w') as f:
+                if lines:
+                    record["rows"] = write_ndjson(f, snapshot_iter, account_to_index)
+                else:
+                    record["rows"] = write_json_stream(f, snapshot_iter, account_to_index)
+        print("done")
+        
+    def export_arrays(self, path, task="classification", delta_t=3*3600, edge_type="weighted", max_snapshot_idx=None, top_k_nodes=None, n_jobs=None, backend="networkx"):
+        """Export snapshots into NumPy arrays in the 'path' folder. The content is the same as in 'to_json', but edges and weights are concatenated over snapshots (see 'edge_offsets.npy') while node features and labels are stored in (snapshot x node) arrays. Use 'load_snapshot_arrays' to memory-map the exported arrays."""
+        snapshots, grouped_data, labels = self._get_task_inputs(task, delta_t)
+        account_to_index = self.get_account_recoder(k=top_k_nodes)
+        num_snapshots = len(snapshots) if max_snapshot_idx == None else len(snapshots[:max_snapshot_idx])
+        snapshot_iter = self._iter_json_data(snapshots, grouped_data, labels, edge_type, max_snapshot_idx, account_to_index, n_jobs, backend)
+        meta = {
+            "task": task,
+            "delta_t": delta_t if task != "classification" else None,
+            "edge_type": edge_type,
+            "summary": self.summary(),
+        }
+        with self.profiler.stage("export_arrays", rows=num_snapshots):
+            write_snapshot_arrays(path, snapshot_iter, num_snapshots, account_to_index, meta)
         print("done")
         
\ No newline at end of file
@@ -1,23 +1,56 @@
 import pandas as pd
+import numpy as np
 import networkx as nx
-from collections import Counter
+import multiprocessing as mp
 
 ### EDGES ###
 
+def encode_columns(df, group_cols):
+    """Encode the rows of the given columns into integer group identifiers assigned in order of first occurrence."""
+    group_ids = np.zeros(len(df), dtype="int64")
+    for col in group_cols:
+        # shift codes to keep missing values as a separate group
+        codes, uniques = pd.factorize(df[col])
+        group_ids = group_ids * (len(uniques) + 1) + (codes + 1)
+        # re-factorize to avoid overflow when the columns have many distinct values
+        group_ids, _ = pd.factorize(group_ids)
+    return group_ids
+
 def groupby_count(df, group_cols, count_col):
-    parts = [df[col] for col in group_cols]
-    tuples = list(zip(*parts))
-    cnt = Counter(tuples)
-    keys, counts = zip(*list(cnt.items()))
-    res = pd.DataFrame(keys, columns=group_cols)
+    """Count the occurrences of the distinct rows of 'group_cols'. Rows are returned in order of first occurrence."""
+    group_ids = encode_columns(df, group_cols)
+    _, first_idx, counts = np.unique(group_ids, return_index=True, return_counts=True)
+    res = pd.DataFrame({col:np.asarray(df[col])[first_idx] for col in group_cols})
     res[count_col] = counts
     return res
 
+def partition_edges(df, key_col="date"):
+    """Sort the records by 'key_col' in a single pass. Return the sorted dataframe, the sorted distinct keys and the (start, end) offsets of each key. Records keep their original order within a key and the sort is skipped if the keys are already ordered. Records with missing keys are dropped."""
+    codes, keys = pd.factorize(df[key_col], sort=True)
+    if len(codes) > 0 and np.any(codes[1:] < codes[:-1]):
+        order = np.argsort(codes, kind="stable")
+        df = df.iloc[order]
+        codes = codes[order]
+    counts = np.bincount(codes[codes >= 0], minlength=len(keys))
+    ends = np.cumsum(counts) + np.sum(codes < 0)
+    starts = ends - counts
+    return df, list(keys), list(zip(starts, ends))
+
+def groupby_sum(df, group_cols, value_col, sum_col):
+    """Sum 'value_col' over the distinct rows of 'group_cols'. Rows are returned in order of first occurrence."""
+    group_ids = encode_columns(df, group_cols)
+    _, first_idx = np.unique(group_ids, return_index=True)
+    sums = np.bincount(group_ids, weights=df[value_col].values, minlength=len(first_idx))
+    res = pd.DataFrame({col:np.asarray(df[col])[first_idx] for col in group_cols})
+    res[sum_col] = sums.astype(df[value_col].dtype)
+    return res
+
 def group_edges(df, key_col="date"):
+    """Group records by 'key_col'. The groups are slices of a single sorted dataframe."""
+    sorted_df, keys, offsets = partition_edges(df, key_col)
     edges_grouped = {}
-    keys = sorted(list(df[key_col].unique()))
-    for key in keys:
-        edges_grouped[key] = df[df[key_col]==key].copy()
+    for key, (start, end) in zip(keys, offsets):
+        edges_grouped[key] = sorted_df.iloc[start:end]
     return edges_grouped
 
 def get_weighted_edges(df, group_cols):
@@ -33,27 +66,41 @@ def prepare_edges(mentions, snapshot_col="date"):
 
 ### NODE REINDEXING ###
 
-def reindex_labels(label_dict, id2account, account2index):
-    tuples = []
-    for key, label in label_dict.items():
-        account = id2account[key]
-        if account in account2index:
-            new_id = account2index[account]
-            tuples.append((new_id, label))
-    new_dict = dict(tuples)
+def get_index_lookup(id_to_account, account_to_index):
+    """Return sorted node ids with the index of their accounts (-1 if the account has no index). Build it once per account recoder."""
+    ids = np.fromiter(id_to_account.keys(), dtype="int64", count=len(id_to_account))
+    indices = np.fromiter((account_to_index.get(account, -1) for account in id_to_account.values()), dtype="int64", count=len(id_to_account))
+    order = np.argsort(ids, kind="stable")
+    return ids[order], indices[order]
+
+def lookup_index(node_ids, index_lookup):
+    """Map node ids to account indices with binary search. Unknown nodes get -1."""
+    ids, indices = index_lookup
+    node_ids = np.asarray(node_ids, dtype="int64")
+    if len(ids) == 0:
+        return np.full(len(node_ids), -1, dtype="int64")
+    pos = np.minimum(np.searchsorted(ids, node_ids), len(ids)-1)
+    return np.where(ids[pos] == node_ids, indices[pos], -1)
+
+def reindex_labels(label_dict, id2account, account2index, index_lookup=None):
+    if index_lookup == None:
+        index_lookup = get_index_lookup(id2account, account2index)
+    new_ids = lookup_index(list(label_dict.keys()), index_lookup)
+    mask = new_ids >= 0
+    labels = np.array(list(label_dict.values()), dtype=object)
+    new_dict = dict(zip(new_ids[mask].tolist(), labels[mask].tolist()))
     ordered_dict = dict(sorted(new_dict.items()))
     return ordered_dict
 
-def reindex_edges(df, id_to_account, account_to_index=None, src_col="src_screen_str", trg_col="trg_screen_str"):
+def reindex_edges(df, id_to_account, account_to_index=None, src_col="src_screen_str", trg_col="trg_screen_str", index_lookup=None):
     if account_to_index != None:
-        accounts = list(account_to_index.keys())
-        tmp = df.copy()
-        # old solution would also be good with isnull()
-        tmp[src_col] = tmp["src"].apply(lambda x: id_to_account.get(x))
-        tmp[trg_col] = tmp["trg"].apply(lambda x: id_to_account.get(x))
-        tmp = tmp[tmp[src_col].isin(accounts) & tmp[trg_col].isin(accounts)]
-        src = tmp[src_col].apply(lambda x: account_to_index.get(x))
-        trg = tmp[trg_col].apply(lambda x: account_to_index.get(x))
+        if index_lookup == None:
+            index_lookup = get_index_lookup(id_to_account, account_to_index)
+        src = lookup_index(df["src"].values, index_lookup)
+        trg = lookup_index(df["trg"].values, index_lookup)
+        mask = (src >= 0) & (trg >= 0)
+        src = pd.Series(src[mask], index=df.index[mask], name=src_col)
+        trg = pd.Series(trg[mask], index=df.index[mask], name=trg_col)
     else:
         src = df["src"]
         trg = df["trg"]
@@ -63,14 +110,76 @@ def reindex_edges(df, id_to_account, account_to_index=None, src_col="src_screen_
 
 def regression_labels(df, snapshot_col):
     label_records = groupby_count(df, [snapshot_col,"trg"], "count")
-    snapshots = sorted(list(label_records[snapshot_col].unique()))
+    return label_records_to_dicts(label_records, snapshot_col)
+
+def label_records_to_dicts(label_records, snapshot_col):
+    label_records, snapshots, offsets = partition_edges(label_records, snapshot_col)
+    trg, count = label_records["trg"].tolist(), label_records["count"].tolist()
     labels = {}
-    for snapshot_id in snapshots:
-        rec_tmp = label_records[label_records[snapshot_col]==snapshot_id]
-        dict_tmp = dict(zip(rec_tmp["trg"],rec_tmp["count"]))
-        labels[snapshot_id] = dict_tmp
+    for snapshot_id, (start, end) in zip(snapshots, offsets):
+        labels[snapshot_id] = dict(zip(trg[start:end], count[start:end]))
     return labels
 
+### SNAPSHOTS ###
+
+def format_snapshot(idx, edges, weights, X, label_dict, id_to_account, account_to_index, index_lookup=None):
+    """Collect the exported data of a snapshot. Edges must be an (N x 2) array of reindexed nodes, while 'label_dict' is keyed by the original node ids."""
+    X = list([X[node] for node in range(len(account_to_index))])
+    X = X[:len(account_to_index)]
+    y = reindex_labels(label_dict, id_to_account, account_to_index, index_lookup)
+    y = list([y.get(node,0) for node in range(len(account_to_index))])
+    y = y[:len(account_to_index)]
+    return {
+        "index":idx,
+        #"date":date,
+        "edges": edge_array_to_list(edges),
+        "weights": weights.tolist(),
+        "y": y,
+        "X": X,
+    }
+
+### MULTI-RESOLUTION SNAPSHOTS ###
+
+def expand_windows(buckets, window, stride):
+    """Assign base buckets to every (possibly overlapping) window containing them. Window 'k' covers buckets [k*stride, k*stride+window). Return the row indices of the buckets with the corresponding window identifiers."""
+    buckets = np.asarray(buckets, dtype="int64")
+    first = np.maximum(0, -((window - 1 - buckets) // stride))
+    last = buckets // stride
+    num_windows = np.maximum(last - first + 1, 0)
+    row_idx = np.repeat(np.arange(len(buckets)), num_windows)
+    row_offsets = np.repeat(np.cumsum(num_windows) - num_windows, num_windows)
+    window_ids = np.repeat(first, num_windows) + np.arange(len(row_idx)) - row_offsets
+    return row_idx, window_ids
+
+def aggregate_base_buckets(mentions, bucket_col="bucket"):
+    """Count weighted edges and mentioned targets in the base buckets"""
+    base_edges = groupby_count(mentions, ["src","trg",bucket_col], "weight")
+    base_labels = groupby_count(mentions, [bucket_col,"trg"], "count")
+    return base_edges, base_labels
+
+def prepare_window_snapshots(mentions, base_edges, base_labels, start_time, window, stride, base_delta, bucket_col="bucket"):
+    """Derive (window, stride) snapshots from base bucket aggregates. 'window' and 'stride' must be multiples of the 'base_delta' bucket size and the mentions must be ordered by epoch. Return the snapshot identifiers, grouped temporal and weighted edges and the regression labels."""
+    window_size, stride_size = window // base_delta, stride // base_delta
+    row_idx, window_ids = expand_windows(base_edges[bucket_col].values, window_size, stride_size)
+    expanded = base_edges.iloc[row_idx][["src","trg","weight"]].assign(snapshot_id=window_ids)
+    weighted_edges = groupby_sum(expanded, ["src","trg","snapshot_id"], "weight", "weight")[["src","trg","snapshot_id","weight"]]
+    weighted_edges_grouped = group_edges(weighted_edges, "snapshot_id")
+    row_idx, window_ids = expand_windows(base_labels[bucket_col].values, window_size, stride_size)
+    expanded = base_labels.iloc[row_idx][["trg","count"]].assign(snapshot_id=window_ids)
+    label_records = groupby_sum(expanded, ["snapshot_id","trg"], "count", "count")
+    labels = label_records_to_dicts(label_records, "snapshot_id")
+    snapshots = sorted(labels.keys())
+    # temporal edges of a window are a contiguous range of the epoch ordered mentions
+    epochs = mentions["epoch"].values
+    window_starts = start_time + np.array(snapshots, dtype="int64") * stride
+    starts = np.searchsorted(epochs, window_starts, side="left")
+    ends = np.searchsorted(epochs, window_starts + window, side="left")
+    edges = mentions[["src","trg"]]
+    edges_grouped = {}
+    for snapshot_id, start, end in zip(snapshots, starts, ends):
+        edges_grouped[snapshot_id] = edges.iloc[start:end]
+    return snapshots, (edges_grouped, weighted_edges_grouped), labels
+
 ### FEATURES ###
 
 def calculate_node_features(G, total_nodes=None, degree=True, transitivity=True):
@@ -84,4 +193,74 @@ def calculate_node_features(G, total_nodes=None, degree=True, transitivity=True)
     if transitivity:
         trans = dict(nx.clustering(G))
         scores.append([trans.get(i,0) for i in range(total_nodes)])
-    return list(zip(*scores))
\ No newline at end of file
+    return list(zip(*scores))
+
+def calculate_node_features_sparse(edges, total_nodes=None, degree=True, transitivity=True):
+    """Calculate the same node features as 'calculate_node_features' from an (N x 2) edge array with sparse matrix operations. Triangles are counted on the degree ordered orientation of the adjacency matrix. Requires SciPy."""
+    try:
+        import scipy.sparse as sp
+    except ImportError:
+        raise ImportError("The 'sparse' backend requires SciPy. Install it with 'pip install scipy'!")
+    edges = np.asarray(edges, dtype="int64").reshape(-1, 2)
+    if total_nodes == None:
+        total_nodes = len(np.unique(edges))
+    src, trg = edges[:,0], edges[:,1]
+    is_loop = src == trg
+    has_loop = np.zeros(total_nodes, dtype="int64")
+    has_loop[src[is_loop]] = 1
+    # symmetric binary adjacency matrix without self-loops
+    rows = np.concatenate([src[~is_loop], trg[~is_loop]])
+    cols = np.concatenate([trg[~is_loop], src[~is_loop]])
+    A = sp.coo_matrix((np.ones(len(rows)), (rows, cols)), shape=(total_nodes, total_nodes)).tocsr()
+    A.data[:] = 1.0
+    num_neighbors = np.diff(A.indptr)
+    scores = []
+    if degree:
+        # self-loops are counted twice in networkx
+        scores.append((num_neighbors + 2 * has_loop).tolist())
+    if transitivity:
+        rank = np.empty(total_nodes, dtype="int64")
+        rank[np.lexsort((np.arange(total_nodes), num_neighbors))] = np.arange(total_nodes)
+        A = A.tocoo()
+        forward = rank[A.row] < rank[A.col]
+        U = sp.csr_matrix((A.data[forward], (A.row[forward], A.col[forward])), shape=(total_nodes, total_nodes))
+        # each triangle (u,v,w) with rank u < v < w is found once as the lowest, the middle and the highest node
+        low_high = (U @ U).multiply(U)
+        middle = (U.T @ U).multiply(U)
+        triangles = np.asarray(low_high.sum(axis=1)).ravel() + np.asarray(low_high.sum(axis=0)).ravel() + np.asarray(middle.sum(axis=1)).ravel()
+        pairs = num_neighbors * (num_neighbors - 1)
+        clustering = np.divide(2 * triangles, pairs, out=np.zeros(total_nodes), where=triangles > 0)
+        scores.append([0 if t == 0 else c for t, c in zip(triangles.tolist(), clustering.tolist())])
+    return list(zip(*scores))
+
+def edge_array_to_list(edges):
+    """Convert an (N x 2) edge array into a list of edge tuples"""
+    return list(map(tuple, edges.tolist()))
+
+def edges_to_node_features(edges, total_nodes=None, backend="networkx"):
+    """Calculate node features of the graph defined by an (N x 2) edge array. Choose from 'networkx' and 'sparse' options for the 'backend' argument."""
+    if backend == "networkx":
+        G = nx.Graph()
+        G.add_edges_from(edge_array_to_list(edges))
+        return calculate_node_features(G, total_nodes)
+    elif backend == "sparse":
+        return calculate_node_features_sparse(edges, total_nodes)
+    else:
+        raise RuntimeError("Choose 'backend' parameter from 'networkx' or 'sparse'!")
+
+def _snapshot_features(task):
+    edges, weights, total_nodes, backend = task
+    return edges, weights, edges_to_node_features(edges, total_nodes, backend)
+
+def map_snapshot_features(edge_iter, total_nodes=None, n_jobs=None, backend="networkx"):
+    """Calculate node features for each (edges, weights) snapshot and yield (edges, weights, features) in the original snapshot order. Snapshots are processed in 'n_jobs' processes (use -1 for all CPUs)."""
+    tasks = ((edges, weights, total_nodes, backend) for edges, weights in edge_iter)
+    if n_jobs == None or n_jobs == 1:
+        for task in tasks:
+            yield _snapshot_features(task)
+    else:
+        if n_jobs < 0:
+            n_jobs = mp.cpu_count()
+        with mp.Pool(n_jobs) as pool:
+            for res in pool.imap(_snapshot_features, tasks):
+                yield res
\ No newline at end of file
@@ -0,0 +1,104 @@
+import pandas as pd
+import numpy as np
+import os, re, gzip, bz2, lzma, zipfile
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+def get_pandas_version():
+    return tuple(int(part) for part in re.findall(r"\d+", pd.__version__)[:2])
+
+# the 'pyarrow' engine of 'pd.read_csv' is available from pandas 1.4
+CSV_ENGINE = "pyarrow" if pyarrow != None and get_pandas_version() >= (1, 4) else "c"
+
+# compressed variants of the data files (suffix -> codec)
+COMPRESSIONS = {".gz": "gzip", ".bz2": "bz2", ".xz": "xz", ".zst": "zstd"}
+
+MENTION_COLUMNS = ["epoch", "src", "trg", "src_screen_str", "trg_screen_str"]
+MENTION_DTYPES = {
+    "epoch": "int64",
+    "src": "int64",
+    "trg": "int64",
+    "src_screen_str": "str",
+    "trg_screen_str": "str",
+}
+
+### DATA FILES ###
+
+def find_member(zip_file, file_name):
+    """Return the archive member with the given base name"""
+    for member in zip_file.namelist():
+        if os.path.basename(member) == file_name:
+            return member
+    raise RuntimeError("'%s' was not found in the archive!" % file_name)
+
+def find_data_file(data_dir, file_name):
+    """Locate a data file as '<data_dir>/<file_name>', as a compressed variant of it (see 'COMPRESSIONS') or as a member of the '<data_dir>.zip' archive (in this order). Return the path and the archive member ('None' for files) or 'None' if the file is not available."""
+    file_path = os.path.join(data_dir, file_name)
+    for suffix in [""] + list(COMPRESSIONS.keys()):
+        if os.path.exists(file_path + suffix):
+            return file_path + suffix, None
+    archive_path = os.path.normpath(data_dir) + ".zip"
+    if os.path.exists(archive_path):
+        try:
+            with zipfile.ZipFile(archive_path) as zf:
+                return archive_path, find_member(zf, file_name)
+        except (RuntimeError, zipfile.BadZipFile):
+            # missing member or corrupted archive
+            pass
+    return None
+
+def open_data_file(file_path, member=None):
+    """Open a data file located by 'find_data_file' as a binary stream. Compressed files and archive members are decompressed on the fly while the stream is read. The native decompressors of 'pyarrow' are used if it is installed (except for '.xz')."""
+    if member != None:
+        with zipfile.ZipFile(file_path) as zf:
+            # the archive file is kept open until the member stream is closed
+            return zf.open(member)
+    compression = COMPRESSIONS.get(os.path.splitext(file_path)[1])
+    if compression == None:
+        return open(file_path, "rb")
+    if pyarrow != None and compression != "xz" and pyarrow.Codec.is_available(compression):
+        return pyarrow.input_stream(file_path, compression=compression)
+    if compression == "gzip":
+        return gzip.open(file_path)
+    if compression == "bz2":
+        return bz2.open(file_path)
+    if compression == "xz":
+        return lzma.open(file_path)
+    try:
+        import zstandard
+    except ImportError:
+        raise RuntimeError("Install 'pyarrow' or 'zstandard' to read '%s'!" % file_path)
+    return zstandard.ZstdDecompressor().stream_reader(open(file_path, "rb"), closefd=True)
+
+### MENTIONS ###
+
+def is_sorted(values):
+    """Check whether the values are in non-decreasing order"""
+    return len(values) < 2 or bool(np.all(values[1:] >= values[:-1]))
+
+def filter_time_range(mentions, start_time=None, end_time=None):
+    """Keep mentions with 'start_time' <= epoch <= 'end_time'"""
+    mask = np.ones(len(mentions), dtype=bool)
+    if start_time != None:
+        mask &= mentions["epoch"].values >= start_time
+    if end_time != None:
+        mask &= mentions["epoch"].values <= end_time
+    return mentions if mask.all() else mentions[mask]
+
+def read_mentions(file_path, start_time=None, end_time=None, engine=None, chunksize=None, sep="|"):
+    """Load the mention columns of a mention file (path or binary stream) ordered by epoch. Only the required columns are parsed with fixed dtypes. The multithreaded 'pyarrow' reader is used by default if it is installed (with pandas 1.4 or later). If 'chunksize' is set, the file is read in chunks and mentions outside ['start_time', 'end_time'] are dropped chunk by chunk. The sort is skipped if the file is already ordered by epoch. The sort is stable, so mentions with the same epoch keep their file order."""
+    engine = CSV_ENGINE if engine == None else engine
+    read_kwargs = dict(sep=sep, usecols=MENTION_COLUMNS, dtype=MENTION_DTYPES)
+    if chunksize != None:
+        # the pyarrow reader does not support chunks
+        chunks = [filter_time_range(chunk, start_time, end_time) for chunk in pd.read_csv(file_path, chunksize=chunksize, engine="c", **read_kwargs)]
+        mentions = pd.concat(chunks) if len(chunks) > 0 else pd.DataFrame({col:pd.Series(dtype=dtype) for col, dtype in MENTION_DTYPES.items()})
+    else:
+        mentions = filter_time_range(pd.read_csv(file_path, engine=engine, **read_kwargs), start_time, end_time)
+    mentions = mentions[MENTION_COLUMNS]
+    if not is_sorted(mentions["epoch"].values):
+        mentions = mentions.sort_values("epoch", kind="stable")
+    return mentions
@@ -0,0 +1,84 @@
+import pandas as pd
+import os, sys, time
+from contextlib import contextmanager
+
+PROFILE_COLUMNS = ["stage", "time", "rows", "memory_delta_mb"]
+
+def get_memory_usage():
+    """Return the resident set size of the process in bytes. The peak resident set size is returned on systems without '/proc' and 'None' if neither is available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+def memory_delta_mb(start_memory):
+    end_memory = get_memory_usage()
+    if start_memory == None or end_memory == None:
+        return None
+    return (end_memory - start_memory) / 2**20
+
+class StageProfiler():
+    """Collect the wall time, the number of processed rows and the memory delta of pipeline stages. Every finished stage is appended to 'records' and passed to each hook, e.g. 'lambda record: print(record)'. A record is a dictionary with 'stage', 'time' (seconds), 'rows' and 'memory_delta_mb' keys."""
+
+    def __init__(self, hooks=None):
+        self.hooks = [] if hooks == None else list(hooks)
+        self.records = []
+
+    def add_hook(self, hook):
+        """Register a function that is called with the record of each finished stage"""
+        self.hooks.append(hook)
+
+    def _emit(self, record):
+        self.records.append(record)
+        for hook in self.hooks:
+            hook(record)
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        """Measure the enclosed code block as a stage. The number of rows can be set through the yielded record: 'record["rows"] = n'."""
+        record = {"stage": name, "rows": rows}
+        start_memory = get_memory_usage()
+        start = time.time()
+        yield record
+        record["time"] = time.time() - start
+        record["memory_delta_mb"] = memory_delta_mb(start_memory)
+        self._emit(record)
+
+    def profile_iter(self, name, iterable):
+        """Measure the time spent on producing the items of an iterable as a single stage. The number of rows is the number of items. The stage is recorded when the iteration stops."""
+        record = {"stage": name, "rows": 0, "time": 0.0}
+        start_memory = get_memory_usage()
+        iterator = iter(iterable)
+        try:
+            while True:
+                start = time.time()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    record["time"] += time.time() - start
+                record["rows"] += 1
+                yield item
+        finally:
+            record["memory_delta_mb"] = memory_delta_mb(start_memory)
+            self._emit(record)
+
+    def report(self):
+        """Summarize the records by stage in the order of their first occurrence: number of calls, total time, rows and memory delta"""
+        if len(self.records) == 0:
+            return pd.DataFrame(columns=["stage", "calls"] + PROFILE_COLUMNS[1:])
+        df = pd.DataFrame(self.records, columns=PROFILE_COLUMNS)
+        report = df.groupby("stage", sort=False).agg(calls=("time", "size"), time=("time", "sum"), rows=("rows", "sum"), memory_delta_mb=("memory_delta_mb", "sum"))
+        return report.reset_index()
+
+    def clear(self):
+        self.records = []
@@ -0,0 +1,79 @@
+import numpy as np
+from .handler_utils import *
+
+class SnapshotStream():
+    """Online snapshot generator for mention streams. Events (epoch, src, trg) must arrive in temporal order. Weighted edge counts and the number of mentions per target node are updated on-the-fly for the current 'delta_t' window, and the snapshot (edges, weights, node features and labels) is emitted when the window closes. Windows without events are skipped, just like in 'TennisDataHandler.get_regression_data'."""
+
+    def __init__(self, start_time, delta_t, id_to_account, account_to_index, edge_type="weighted", end_time=None, backend="networkx"):
+        self.start_time = start_time
+        self.end_time = end_time
+        self.delta_t = delta_t
+        self.edge_type = edge_type
+        self.backend = backend
+        self.id_to_account = id_to_account
+        self.account_to_index = account_to_index
+        self.index_lookup = get_index_lookup(id_to_account, account_to_index)
+        self.num_snapshots = 0
+        self.last_epoch = None
+        self._reset_window(None)
+
+    def _reset_window(self, window_id):
+        self.window_id = window_id
+        self.temporal_edges = []
+        self.edge_counts = {}
+        self.target_counts = {}
+
+    def update(self, epoch, src, trg):
+        """Process a single mention. Return the list of snapshots finished by this event."""
+        if self.last_epoch != None and epoch < self.last_epoch:
+            raise RuntimeError("Events must be ordered by epoch!")
+        self.last_epoch = epoch
+        if epoch < self.start_time or (self.end_time != None and epoch >= self.end_time):
+            return []
+        finished = []
+        window_id = (epoch - self.start_time) // self.delta_t
+        if window_id != self.window_id:
+            snapshot = self.flush()
+            if snapshot != None:
+                finished.append(snapshot)
+            self._reset_window(window_id)
+        if self.edge_type == "temporal":
+            self.temporal_edges.append((src, trg))
+        else:
+            self.edge_counts[(src, trg)] = self.edge_counts.get((src, trg), 0) + 1
+        self.target_counts[trg] = self.target_counts.get(trg, 0) + 1
+        return finished
+
+    def flush(self):
+        """Close the current window. Return its snapshot or 'None' if the window is empty."""
+        if len(self.target_counts) == 0:
+            return None
+        if self.edge_type == "temporal":
+            raw_edges = self.temporal_edges
+            weights = np.ones(len(raw_edges))
+        else:
+            raw_edges = list(self.edge_counts.keys())
+            if self.edge_type == "weighted":
+                weights = np.array(list(self.edge_counts.values()), dtype="int64")
+            else:
+                weights = np.ones(len(raw_edges))
+        raw_edges = np.array(raw_edges, dtype="int64").reshape(-1, 2)
+        src = lookup_index(raw_edges[:,0], self.index_lookup)
+        trg = lookup_index(raw_edges[:,1], self.index_lookup)
+        mask = (src >= 0) & (trg >= 0)
+        edges = np.column_stack([src[mask], trg[mask]])
+        weights = weights[:len(edges)]
+        X = edges_to_node_features(edges, len(self.account_to_index), self.backend)
+        snapshot = format_snapshot(self.num_snapshots, edges, weights, X, self.target_counts, self.id_to_account, self.account_to_index, self.index_lookup)
+        self.num_snapshots += 1
+        self._reset_window(None)
+        return snapshot
+
+    def process(self, events):
+        """Generate snapshots from an iterable of (epoch, src, trg) events. The last window is closed at the end of the stream."""
+        for epoch, src, trg in events:
+            for snapshot in self.update(epoch, src, trg):
+                yield snapshot
+        snapshot = self.flush()
+        if snapshot != None:
+            yield snapshot
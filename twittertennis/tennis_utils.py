@@ -1,5 +1,7 @@
 import pandas as pd
+import numpy as np
 import datetime
+from collections.abc import Mapping
 import seaborn as sns
 import matplotlib.pyplot as plt
 
@@ -10,25 +12,67 @@ def scores2file(score_map, output_file, sep=" "):
     score_df = pd.DataFrame(score_map, columns=["node_id","score"])
     score_df.to_csv(output_file,sep=sep, header=False, index=False)
 
-def epoch2date(epoch, tz_info=None):
-    """Convert epoch to date based on timezone information. If 'tz_info==None' then local timezone information is used."""
+def utc_offset(epoch, tz_info=None):
+    """Return the UTC offset (in seconds) of the timezone at the given epoch. If 'tz_info==None' then local timezone information is used."""
     if tz_info == None:
-        dt = datetime.datetime.fromtimestamp(epoch)
+        dt = datetime.datetime.fromtimestamp(epoch, datetime.timezone.utc).astimezone()
     else:
         dt = datetime.datetime.fromtimestamp(epoch, tz=tz_info)
-    return "%i-%.2i-%.2i" % (dt.year, dt.month, dt.day)
+    return int(dt.utcoffset().total_seconds())
+
+def epochs2dates(epochs, tz_info=None, bucket_size=900):
+    """Vectorized conversion of epochs to dates based on timezone information. UTC offsets are only evaluated once per 'bucket_size' seconds, buckets containing a timezone transition fall back to exact offsets."""
+    epochs = np.asarray(epochs)
+    if len(epochs) == 0:
+        return np.array([], dtype=object)
+    buckets = (epochs // bucket_size).astype("int64")
+    unique_buckets, bucket_idx = np.unique(buckets, return_inverse=True)
+    bucket_idx = bucket_idx.reshape(-1)
+    start_offsets = np.array([utc_offset(int(b) * bucket_size, tz_info) for b in unique_buckets], dtype="int64")
+    end_offsets = np.array([utc_offset((int(b) + 1) * bucket_size, tz_info) for b in unique_buckets], dtype="int64")
+    offsets = start_offsets[bucket_idx]
+    transition_mask = (start_offsets != end_offsets)[bucket_idx]
+    if transition_mask.any():
+        offsets[transition_mask] = [utc_offset(e, tz_info) for e in epochs[transition_mask].tolist()]
+    days = ((epochs + offsets) // 86400).astype("int64")
+    # format only the distinct days
+    unique_days, inverse = np.unique(days, return_inverse=True)
+    unique_dates = unique_days.astype("datetime64[D]").astype(str).astype(object)
+    return unique_dates[inverse.reshape(-1)]
+
+def epoch2date(epoch, tz_info=None):
+    """Convert epoch to date based on timezone information. If 'tz_info==None' then local timezone information is used."""
+    day = (epoch + utc_offset(epoch, tz_info)) // 86400
+    return str(np.datetime64(int(day), "D"))
 
 ### Tennis player information ###
 
+def local_midnight(date, tz_info):
+    """Return the epoch of 0:00 on the given date in the given timezone"""
+    dt = datetime.datetime.strptime(date, "%Y-%m-%d")
+    return int(tz_info.localize(dt).timestamp())
+
 def update_match_counts(df, true_matches):
-    found_players=set(true_matches.keys())
-    df["found_players"] = df["players"].apply(lambda p_list: [p for p in p_list if p in true_matches])
-    df['missing_players'] = df['players'].apply(lambda x: list(set(x)-found_players))
-    df["num_players"] = df.apply(lambda x: len(x["players"]), axis=1)
-    df["num_found_players"] = df.apply(lambda x: len(x["found_players"]), axis=1)
-    df["num_missing_players"] = df.apply(lambda x: len(x["missing_players"]), axis=1)
+    """Add the found and missing players of each day with their counts to the dataframe (in-place)"""
+    player_sets = df["players"].tolist()
+    num_players = np.array([len(players) for players in player_sets], dtype="int64")
+    offsets = np.concatenate([[0], np.cumsum(num_players)])
+    flat_players = np.empty(offsets[-1], dtype=object)
+    flat_players[:] = [p for players in player_sets for p in players]
+    is_found = pd.Series(flat_players, dtype=object).isin(list(true_matches.keys())).values
+    found_players = set(true_matches.keys())
+    df["found_players"] = [flat_players[offsets[i]:offsets[i+1]][is_found[offsets[i]:offsets[i+1]]].tolist() for i in range(len(player_sets))]
+    df["missing_players"] = [list(set(players) - found_players) for players in player_sets]
+    df["num_players"] = num_players
+    df["num_found_players"] = np.bincount(np.repeat(np.arange(len(player_sets)), num_players)[is_found], minlength=len(player_sets))
+    df["num_missing_players"] = df["num_players"] - df["num_found_players"]
     df["frac_missing_players"] = df["num_missing_players"] / df["num_players"]
 
+def get_match_ids(schedule_df):
+    """Match identifiers (header, court and order number) of the schedule rows"""
+    order_numbers = [str(int(order_number)) for order_number in schedule_df["orderNumber"]]
+    return schedule_df["matchHeader"].astype(str).values + "_" + schedule_df["courtName"].astype(str).values + "_" + np.array(order_numbers, dtype=object)
+
 def extract_daily_players(schedule_df, player_accounts, category_filter_func=None):
     """Return daily tennis players in dictionary and dataframe based on the schedule and the found player-account assigments."""
     true_matches = player_accounts
@@ -37,21 +81,31 @@ def extract_daily_players(schedule_df, player_accounts, category_filter_func=Non
         schedule_df_tmp = schedule_df
     else:
             schedule_df_tmp = schedule_df[schedule_df["matchHeader"].apply(category_filter_func)]
+    # both players of a match in schedule order (active player first)
+    match_ids = get_match_ids(schedule_df_tmp)
+    players_df = pd.DataFrame({
+        "date": np.repeat(schedule_df_tmp["date"].values, 2),
+        "player": np.column_stack([schedule_df_tmp["playerName active"].values, schedule_df_tmp["playerName opponent"].values]).reshape(-1),
+        "match_id": np.repeat(match_ids, 2),
+    })
+    # players keep the position of their first match and get the id of their last match on each day
+    last_matches = players_df.groupby(["date", "player"], sort=False, dropna=False)["match_id"].last()
     daily_players = {}
-    for index, row in schedule_df_tmp.iterrows():
-        date, winner, loser = row["date"], row["playerName active"], row["playerName opponent"]
-        header, court, match = row["matchHeader"], row["courtName"], row["orderNumber"]
-        match_id = "%s_%s_%i" % (header, court, match)
+    dates, players = last_matches.index.get_level_values(0).tolist(), last_matches.index.get_level_values(1).tolist()
+    for date, player, match_id in zip(dates, players, last_matches.tolist()):
         if not date in daily_players:
             daily_players[date] = {}
-        daily_players[date][winner] = match_id
-        daily_players[date][loser] = match_id
-    # daily players grouped
+        daily_players[date][player] = match_id
+    daily_players_df = daily_players_to_df(daily_players, true_matches)
+    return daily_players, daily_players_df
+
+def daily_players_to_df(daily_players, true_matches):
+    """Group daily players into a dataframe with found and missing player statistics."""
     daily_players_grouped = [(key, set(daily_players[key].keys())) for key in daily_players]
     daily_players_df = pd.DataFrame(daily_players_grouped, columns=["date", "players"])
     update_match_counts(daily_players_df, true_matches)
     daily_players_df = daily_players_df.sort_values("date").reset_index(drop=True)
-    return daily_players, daily_players_df
+    return daily_players_df
 
 ### Labeling nodes ###
 
@@ -68,20 +122,66 @@ def set_label_value(label_value_dict, user, date_idx, collected_dates, screen_na
                 label = label_value_dict["next"]
     return label
 
+class LabelDictView(Mapping):
+    """Read-only dictionary view of the daily node labels. Only non-zero labels are stored, every other node has 0.0 label."""
+    
+    def __init__(self, node_ids, node_positions, non_zero_labels):
+        self._node_ids = node_ids
+        self._node_positions = node_positions
+        self._non_zero_labels = non_zero_labels
+        
+    def __getitem__(self, node_id):
+        if node_id in self._non_zero_labels:
+            return self._non_zero_labels[node_id]
+        elif node_id in self._node_positions:
+            return 0.0
+        else:
+            raise KeyError(node_id)
+        
+    def __iter__(self):
+        return iter(self._node_ids)
+    
+    def __len__(self):
+        return len(self._node_ids)
+
+def get_relevance_label_matrix(label_value_dict, collected_dates, mapper_dicts):
+    """Compute the (day x node) relevance label matrix in coordinate format. Only the accounts of tennis players are evaluated. Return the node ids (in order of first occurrence) with the day indices, node indices and values of the non-zero labels."""
+    screen_name_to_player, user_dict, daily_found_player_dict = mapper_dicts
+    node_ids = list(dict.fromkeys(user_dict.values()))
+    node_positions = dict(zip(node_ids, range(len(node_ids))))
+    # an id with multiple accounts gets the label of its last account
+    last_account = dict(zip(user_dict.values(), user_dict.keys()))
+    player_accounts = [user for user in screen_name_to_player if user in user_dict and last_account[user_dict[user]] == user]
+    day_indices, node_indices, labels = [], [], []
+    for date_idx in range(len(collected_dates)):
+        for user in player_accounts:
+            label = set_label_value(label_value_dict, user, date_idx, collected_dates, screen_name_to_player, daily_found_player_dict)
+            if label != 0.0:
+                day_indices.append(date_idx)
+                node_indices.append(node_positions[user_dict[user]])
+                labels.append(label)
+    day_indices = np.array(day_indices, dtype="int64")
+    node_indices = np.array(node_indices, dtype="int64")
+    labels = np.array(labels, dtype="float64")
+    order = np.lexsort((node_indices, day_indices))
+    return np.array(node_ids, dtype="int64"), day_indices[order], node_indices[order], labels[order]
+
 def get_daily_label_dicts(label_value_dict, collected_dates, mentions_df, mapper_dicts, verbose=False):
-    """Label users in mention data based on schedule."""
+    """Label users in mention data based on schedule. The daily dictionaries are views of the sparse relevance label matrix."""
     screen_name_to_player, user_dict, daily_found_player_dict = mapper_dicts
     if verbose:
         print(len(screen_name_to_player), len(user_dict), len(daily_found_player_dict), len(mentions_df))
     daily_label_dicts = {}
     if verbose:
         print("Labeling users STARTED")
+    node_ids, day_indices, node_indices, labels = get_relevance_label_matrix(label_value_dict, collected_dates, mapper_dicts)
+    node_id_list = node_ids.tolist()
+    node_positions = dict(zip(node_id_list, range(len(node_id_list))))
+    day_offsets = np.searchsorted(day_indices, np.arange(len(collected_dates)+1))
     for date_idx, date in enumerate(collected_dates):
-        label_dict = {}
-        for user in user_dict:
-            user_id = user_dict[user]
-            label_dict[user_id] = set_label_value(label_value_dict, user, date_idx, collected_dates, screen_name_to_player, daily_found_player_dict)
-        daily_label_dicts[date] = label_dict
+        start, end = day_offsets[date_idx], day_offsets[date_idx+1]
+        non_zero_labels = dict(zip(node_ids[node_indices[start:end]].tolist(), labels[start:end].tolist()))
+        daily_label_dicts[date] = LabelDictView(node_id_list, node_positions, non_zero_labels)
     if verbose:
         print("Labeling users FINISHED")
     return daily_label_dicts
@@ -110,7 +210,7 @@ def visu_graph(handler, figsize=(12,8)):
     num_of_mentions = handler.mentions["date"].value_counts()
     num_of_nodes = {}
     for d in handler.dates:
-        num_of_nodes[d] = get_num_nodes(handler.mentions, d)
+        num_of_nodes[d] = handler.get_num_nodes(d)
     return visu_mention_count(handler.dates, num_of_mentions, num_of_nodes, figsize)
 
 def visu_mention_count(tournament_dates, num_of_mentions, num_of_nodes, figsize=(12,8)):
@@ -0,0 +1,57 @@
+import pytz, json, datetime
+from .handler import TIMEZONE, QUALIFIER_START, TOURNAMENT_START, DATES_WITH_QUALIFIERS, DATES_WITHOUT_QUALIFIERS, DATES_WITH_NO_GAMES, SCHEDULE_SEP, ALTERNATIVE_PLAYER_NAMES
+from .tennis_utils import local_midnight
+
+# configurations of the registered tournaments (rg17 and uo17 are built-in)
+TOURNAMENT_CONFIGS = {}
+
+def get_dates(first_date, last_date):
+    """Return the dates from 'first_date' to 'last_date' (inclusive) in '%Y-%m-%d' format"""
+    first = datetime.datetime.strptime(first_date, "%Y-%m-%d").date()
+    last = datetime.datetime.strptime(last_date, "%Y-%m-%d").date()
+    return [(first + datetime.timedelta(days=i)).strftime("%Y-%m-%d") for i in range((last - first).days + 1)]
+
+def register_tournament(data_id, timezone, qualifier_start_date, tournament_start_date, last_date, dates_with_no_games=[], schedule_sep=";", alternative_player_names=None):
+    """Register a tournament, so that 'TennisDataHandler' can load it from '<data_dir>/<data_id>'. Dates are given in '%Y-%m-%d' format in the local 'timezone' of the tournament (e.g. 'Europe/Paris'). Data sets with qualifiers start on 'qualifier_start_date', without qualifiers on 'tournament_start_date', and both end with 'last_date'. 'alternative_player_names' maps the player names of the account file to the names in the schedule."""
+    tz_info = pytz.timezone(timezone)
+    if not qualifier_start_date <= tournament_start_date <= last_date:
+        raise RuntimeError("Invalid tournament dates for '%s'!" % data_id)
+    TIMEZONE[data_id] = tz_info
+    QUALIFIER_START[data_id] = local_midnight(qualifier_start_date, tz_info)
+    TOURNAMENT_START[data_id] = local_midnight(tournament_start_date, tz_info)
+    DATES_WITH_QUALIFIERS[data_id] = get_dates(qualifier_start_date, last_date)
+    DATES_WITHOUT_QUALIFIERS[data_id] = get_dates(tournament_start_date, last_date)
+    DATES_WITH_NO_GAMES[data_id] = list(dates_with_no_games)
+    SCHEDULE_SEP[data_id] = schedule_sep
+    ALTERNATIVE_PLAYER_NAMES[data_id] = {} if alternative_player_names == None else dict(alternative_player_names)
+    TOURNAMENT_CONFIGS[data_id] = {
+        "timezone": timezone,
+        "qualifier_start_date": qualifier_start_date,
+        "tournament_start_date": tournament_start_date,
+        "last_date": last_date,
+        "dates_with_no_games": list(dates_with_no_games),
+        "schedule_sep": schedule_sep,
+        "alternative_player_names": ALTERNATIVE_PLAYER_NAMES[data_id],
+    }
+
+def unregister_tournament(data_id):
+    """Remove a registered tournament. Return its configuration or 'None' if 'data_id' was not registered."""
+    for registry in [TIMEZONE, QUALIFIER_START, TOURNAMENT_START, DATES_WITH_QUALIFIERS, DATES_WITHOUT_QUALIFIERS, DATES_WITH_NO_GAMES, SCHEDULE_SEP, ALTERNATIVE_PLAYER_NAMES]:
+        registry.pop(data_id, None)
+    return TOURNAMENT_CONFIGS.pop(data_id, None)
+
+def register_tournaments(configs):
+    """Register tournaments from a dictionary of '{data_id: config}' where each config contains the parameters of 'register_tournament'. Return the registered data identifiers."""
+    for data_id, config in configs.items():
+        register_tournament(data_id, **config)
+    return list(configs.keys())
+
+def load_tournaments(config_path):
+    """Register the tournaments of a JSON config file (see 'register_tournaments'). Return the registered data identifiers."""
+    with open(config_path) as f:
+        configs = json.load(f)
+    return register_tournaments(configs)
+
+def get_tournaments():
+    """Return the identifiers of the available tournaments"""
+    return list(TIMEZONE.keys())